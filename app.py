@@ -1,560 +1,83 @@
-from flask import Flask, render_template, redirect, url_for, flash, request
-from flask_login import (
-    LoginManager,
-    login_user,
-    login_required,
-    logout_user,
-    current_user,
-)
-
-from models import db, User, Item, Order, OrderStatus
-from forms import (
-    RegisterForm,
-    LoginForm,
-    EditAccountForm,
-    CreditForm,
-    ItemForm,
-    OrderForm,
-)
+from flask import Flask
 
 from config import Config
-from seed_db import seed_all
-from werkzeug.utils import secure_filename
-from helpers import get_next_status
+from models import db
+from images import image_url, has_variants
+from catalogue import catalogue
+from fragments import fragment_cache
+from metrics import request_metrics
+from passwords import hash_pool
+from slots import school_time, pickup_label
+from pragmas import apply_sqlite_profile
 import os
-import uuid
-
-
-app = Flask(__name__)
-app.config.from_object(Config)  # Load settings like SECRET_KEY and DB path
-
-UPLOAD_FOLDER = os.path.join(app.root_path, "static", "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-db.init_app(app)
-
-# Set up Flask-Login
-login_manager = LoginManager(app)
-login_manager.login_view = "login"  # Redirect to this route if login is required
-
-
-@login_manager.user_loader
-def load_user(user_id):
-    """Load a user by ID for session tracking (used by Flask-Login)."""
-    return db.session.get(User, int(user_id))
-
-
-@app.route("/")
-def home():
-    """Redirect users from the home page to the dashboard."""
-    return redirect(url_for("dashboard"))
-
-
-@app.route("/register", methods=["GET", "POST"])
-def register():
-    """
-    Register a new user.
-    - Redirects to dashboard if already logged in.
-    - Saves user to the database if form is valid.
-    """
-    if current_user.is_authenticated:
-        return redirect(
-            url_for("dashboard")
-        )  # Don't allow already logged-in users to register again
-
-    form = RegisterForm()
-    # If the form was submitted (POST request) and passed all validation checks
-    if form.validate_on_submit():
-        # Create a new user and save to the database
-        user = User(email=form.email.data)
-        user.set_password(form.password.data)
-        db.session.add(user)
-        db.session.commit()
-        flash("Registration successful. Please log in.", "success")
-        return redirect(url_for("login"))
-    return render_template("register.html", form=form)
-
-
-@app.route("/login", methods=["GET", "POST"])
-def login():
-    """
-    Log in an existing user.
-    - Redirects to dashboard if already logged in.
-    - Authenticates credentials and logs in the user.
-    """
-    if current_user.is_authenticated:
-        return redirect(url_for("dashboard"))
-
-    form = LoginForm()
-    if form.validate_on_submit():
-        # Check if user exists and password is correct
-        user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
-            login_user(user)
-            return redirect(url_for("dashboard"))
-        else:
-            flash("Invalid email or password", "danger")
-    return render_template("login.html", form=form)
-
-
-@app.route("/logout")
-@login_required
-def logout():
-    """Log out the current user and redirect to the login page."""
-    logout_user()
-    return redirect(url_for("login"))
-
-
-@app.route("/dashboard")
-@login_required
-def dashboard():
-    """Render the dashboard page for logged-in users."""
-    return render_template("dashboard.html")
-
-
-@app.route("/account", methods=["GET", "POST"])
-@login_required
-def account():
-    """
-    A form to change the logged in user's password. 
-    Can be extended to other account management features in future.
-    """
-    form = EditAccountForm()
-
-    if form.validate_on_submit():
-        if not current_user.check_password(form.current_password.data):
-            flash("Current password is incorrect.", "danger")
-        else:
-            current_user.set_password(form.new_password.data)
-            db.session.commit()
-            flash("Your password has been updated.", "success")
-            return redirect(url_for("account"))
-
-    return render_template("edit_account.html", form=form)
-
-
-@app.route("/users")
-@login_required
-def users():
-    """
-    Staff-only view of all registered users.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    # Show a list of all users in the system
-    all_users = User.query.all()
-    return render_template("users.html", users=all_users)
-
-
-@app.route("/credit", methods=["GET", "POST"])
-@login_required
-def credit():
-    """
-    Staff-only page that issues credit to students.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    form = CreditForm()
-    if form.validate_on_submit():
-        student = User.query.filter_by(email=form.email.data, is_staff=False).first()
-        if not student:
-            flash("Student not found or this person is not a student.", "danger")
-        else:
-            student.add_credit(form.amount.data)
-            db.session.commit()
-            flash(
-                f"Added ${form.amount.data:.2f} to {student.email}'s account.",
-                "success",
-            )
-            return redirect(url_for("credit"))
-    return render_template("credit.html", form=form)
-
-
-@app.route("/items")
-@login_required
-def items():
-    """
-    Staff-only page for manging items in the store.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    all_items = Item.query.all()
-    return render_template("items.html", items=all_items)
-
-
-@app.route("/items/add", methods=["GET", "POST"])
-@login_required
-def add_item():
-    """
-    Staff-only page for adding a new item to the store.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    form = ItemForm()
-    if form.validate_on_submit():
-        filename = None
-        if form.image.data:
-            original_name = secure_filename(form.image.data.filename)
-            ext = os.path.splitext(original_name)[1]
-            filename = f"{uuid.uuid4().hex}{ext}"
-            image_path = os.path.join(UPLOAD_FOLDER, filename)
-            form.image.data.save(image_path)
-
-        item = Item(
-            name=form.name.data,
-            price=form.price.data,
-            quantity=form.quantity.data,
-            is_vegetarian=form.is_vegetarian.data,
-            image_filename=filename,
-        )
-        db.session.add(item)
-        db.session.commit()
-        flash("Item added successfully.", "success")
-        return redirect(url_for("items"))
-    return render_template("item_form.html", form=form, action="Add")
-
-
-@app.route("/items/<int:item_id>/edit", methods=["GET", "POST"])
-@login_required
-def edit_item(item_id):
-    """
-    Staff-only page for editing items in the store.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    item = Item.query.get_or_404(item_id)
-    form = ItemForm(obj=item)
-
-    if form.validate_on_submit():
-        # Store old filename BEFORE updating it
-        old_filename = item.image_filename
-
-        if form.image.data:
-            # Delete old image if it exists
-            if old_filename:
-                old_path = os.path.join(UPLOAD_FOLDER, old_filename)
-                if os.path.exists(old_path):
-                    os.remove(old_path)
-
-            # Save new image
-            original_name = secure_filename(form.image.data.filename)
-            ext = os.path.splitext(original_name)[1]
-            filename = f"{uuid.uuid4().hex}{ext}"
-            image_path = os.path.join(UPLOAD_FOLDER, filename)
-            form.image.data.save(image_path)
-            item.image_filename = filename
-
-        # Update other fields
-        item.name = form.name.data
-        item.price = form.price.data
-        item.quantity = form.quantity.data
-        item.is_vegetarian = form.is_vegetarian.data
 
-        db.session.commit()
-        flash("Item updated successfully.", "success")
-        return redirect(url_for("items"))
 
-    return render_template("item_form.html", form=form, action="Edit")
-
-
-@app.errorhandler(413)
-def file_too_large(error):
-    """Handles the situation when a staff member tries to upload an image greater than 2MB."""
-    flash("File is too large (max 2MB).", "danger")
-    return redirect(request.referrer or url_for("dashboard"))
-
-
-@app.route("/items/<int:item_id>/delete", methods=["POST"])
-@login_required
-def delete_item(item_id):
-    """
-    Staff-only action for deleting items.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    item = Item.query.get_or_404(item_id)
-
-    # Delete associated image if it exists
-    if item.image_filename:
-        image_path = os.path.join(UPLOAD_FOLDER, item.image_filename)
-        if os.path.exists(image_path):
-            os.remove(image_path)
-
-    db.session.delete(item)
-    db.session.commit()
-    flash("Item deleted successfully.", "success")
-    return redirect(url_for("items"))
-
-
-@app.route("/orders", methods=["GET", "POST"])
-@login_required
-def manage_orders():
+def create_app(config=Config):
     """
-    Staff-only page for viewing all orders.
-    Redirects non-staffs back to dashboard.
+    Build the Flask app: load the config, set up the extensions and register
+    every blueprint. Nothing touches the database until the first request or
+    CLI command, so a prefork server can create the app once and fork.
+    - "flask --app app ..." finds this factory by itself.
+    - Under a WSGI server, point it at "app:create_app()".
     """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    # Split orders
-    active_statuses = {
-        OrderStatus.AWAITING.value,
-        OrderStatus.CONFIRMED.value,
-        OrderStatus.PREPARING.value,
-        OrderStatus.READY.value,
-    }
-
-    active_orders = (
-        Order.query.filter(Order.status.in_(active_statuses))
-        .order_by(Order.timestamp.desc())
-        .all()
-    )
-
-    # Pagination
-    page = request.args.get("page", 1, type=int)
-    closed_statuses = [OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value]
-    closed_orders_pagination = (
-        Order.query.filter(Order.status.in_(closed_statuses))
-        .order_by(Order.timestamp.desc())
-        .paginate(page=page, per_page=5)
-    )
+    app = Flask(__name__)
+    app.config.from_object(config)  # Load settings like SECRET_KEY and DB path
 
-    if request.method == "POST":
-        order_id = int(request.form["order_id"])
-        action = request.form["action"]
-        order = Order.query.get_or_404(order_id)
-
-        if action == "advance":
-            next_status = get_next_status(order.status)
-            if order.status != next_status:
-                order.status = next_status
-                flash(f"Order #{order.id} advanced to '{next_status}'.", "success")
-        elif action == "cancel" and order.status != OrderStatus.CANCELLED.value:
-            order.status = OrderStatus.CANCELLED.value
-            order.user.credit += order.total_cost
-            order.item.quantity += order.quantity
-            flash(
-                f"Order #{order.id} cancelled. Credit refunded and stock restored.",
-                "warning",
-            )
-
-        db.session.commit()
-        return redirect(url_for("manage_orders", page=page))
-
-    return render_template(
-        "manage_orders.html",
-        active_orders=active_orders,
-        closed_orders_pagination=closed_orders_pagination,
+    app.config.setdefault(
+        "UPLOAD_FOLDER", os.path.join(app.root_path, "static", "uploads")
     )
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
+    # Used by templates/macros.html to pick image variants
+    app.add_template_global(image_url)
+    app.add_template_global(has_variants, "has_image_variants")
+    # Used by store.html and manage_orders.html for their cards and rows
+    app.add_template_global(fragment_cache.render, "cached_fragment")
+    # Pickup slot times are stored in UTC and shown on the school's clock
+    app.add_template_filter(school_time)
+    app.add_template_filter(pickup_label)
 
-@app.route("/users/<int:user_id>/promote", methods=["POST"])
-@login_required
-def promote_user(user_id):
-    """
-    Staff-only action for promoting student accounts to staff accounts.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    user = User.query.get_or_404(user_id)
-
-    if user.is_staff:
-        flash("User is already a staff member.", "info")
-    else:
-        user.is_staff = True
-        db.session.commit()
-        flash(f"User '{user.email}' has been promoted to staff.", "success")
-
-    return redirect(url_for("users"))
-
-
-@app.route("/users/<int:user_id>/delete", methods=["POST"])
-@login_required
-def delete_user(user_id):
-    """
-    Staff-only action for deleting users from the system.
-    Redirects non-staffs back to dashboard.
-    """
-    if not current_user.is_staff:
-        flash("Access denied.", "danger")
-        return redirect(url_for("dashboard"))
-
-    user = User.query.get_or_404(user_id)
-
-    if user.id == current_user.id:
-        flash("You cannot delete your own account.", "danger")
-        return redirect(url_for("users"))
-
-    db.session.delete(user)
-    db.session.commit()
-    flash(f"User '{user.email}' has been deleted.", "warning")
-    return redirect(url_for("users"))
+    db.init_app(app)
+    apply_sqlite_profile(app)
+    request_metrics.init_app(app)
+    request_metrics.add_cache("catalogue", catalogue.stats)
+    request_metrics.add_cache("fragments", fragment_cache.stats)
+    request_metrics.add_pool("password_hash", hash_pool.stats)
 
+    from views import auth, users, items, orders, reports, store
+    import commands
 
-@app.route("/store")
-@login_required
-def store():
-    """
-    Student-only page for browsing items in the store.
-    Redirects staff back to dashboard.
-    """
-    if current_user.is_staff:
-        flash("Store is for students only.", "info")
-        return redirect(url_for("dashboard"))
-
-    # Read filter parameters from query string
-    name = request.args.get("name", "").strip()
-    min_price = request.args.get("min_price", type=float)
-    max_price = request.args.get("max_price", type=float)
-    min_quantity = request.args.get("min_quantity", type=int)
-    is_vegetarian = request.args.get("is_vegetarian") == "on"
-
-    # Base query
-    query = Item.query.filter(Item.quantity > 0)
-
-    if name:
-        query = query.filter(Item.name.ilike(f"%{name}%"))
-    if min_price is not None:
-        query = query.filter(Item.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Item.price <= max_price)
-    if min_quantity is not None:
-        query = query.filter(Item.quantity >= min_quantity)
-    if is_vegetarian:
-        query = query.filter(Item.is_vegetarian == True)
-
-    items = query.order_by(Item.name).all()
-    return render_template("store.html", items=items)
-
-
-@app.route("/order/<int:item_id>", methods=["GET", "POST"])
-@login_required
-def order_item(item_id):
-    """
-    Student-only page for ordering items in the store.
-    Redirects staff back to dashboard.
-    """
-    if current_user.is_staff:
-        flash("Only students can place orders.", "danger")
-        return redirect(url_for("dashboard"))
-
-    item = Item.query.get_or_404(item_id)
-
-    if item.quantity <= 0:
-        flash("This item is currently out of stock.", "warning")
-        return redirect(url_for("store"))
-
-    form = OrderForm()
-    if form.validate_on_submit():
-        qty = form.quantity.data
-
-        if qty > item.quantity:
-            flash(f"Only {item.quantity} of '{item.name}' available.", "danger")
-        else:
-            total_cost = item.price * qty
-            if current_user.credit < total_cost:
-                flash("Insufficient credit to place this order.", "danger")
-            else:
-                # Update stock and credit
-                item.quantity -= qty
-                current_user.credit -= total_cost
-
-                order = Order(
-                    user_id=current_user.id,
-                    item_id=item.id,
-                    quantity=qty,
-                    total_cost=total_cost,
-                    status=OrderStatus.AWAITING.value,
-                )
-
-                db.session.add(order)
-                db.session.commit()
-                flash("Order placed successfully!", "success")
-                return redirect(url_for("store"))
-
-    return render_template("order_item.html", item=item, form=form)
-
-
-@app.route("/my-orders")
-@login_required
-def my_orders():
-    """
-    Student-only page for viewing their previous orders.
-    Redirects staff back to dashboard.
-    """
-    if current_user.is_staff:
-        flash("Staff accounts do not place orders.", "info")
-        return redirect(url_for("dashboard"))
-
-    orders = (
-        Order.query.filter_by(user_id=current_user.id)
-        .order_by(Order.timestamp.desc())
-        .all()
-    )
-    return render_template("my_orders.html", orders=orders)
-
-
-@app.context_processor
-def inject_nav_data():
-    """
-    Used to pass credit amount (or active order quantity if staff)
-    into the navbar for display.
-    """
-    from models import Order, OrderStatus
-
-    if current_user.is_authenticated:
-        if current_user.is_staff:
-            active_statuses = {
-                OrderStatus.AWAITING.value,
-                OrderStatus.CONFIRMED.value,
-                OrderStatus.PREPARING.value,
-                OrderStatus.READY.value,
-            }
-            active_order_count = Order.query.filter(
-                Order.status.in_(active_statuses)
-            ).count()
-            return {"active_order_count": active_order_count}
-        else:
-            return {"student_credit": current_user.credit}
-    return {}
+    auth.login_manager.init_app(app)
+    for module in (auth, users, items, orders, reports, store, commands):
+        app.register_blueprint(module.bp)
+    return app
 
 
 if __name__ == "__main__":
     """
-    Initialize the database, seed default users, and start the development server.
+    Start the development server, after resetting and seeding the database
+    if RESET_DB_ON_LAUNCH is set (otherwise the database is upgraded in place).
     This block runs only when this file is executed directly (not imported), i.e. "python app.py".
+    Outside development, use "flask --app app seed" and "flask --app app upgrade-db".
     """
+    from commands import seed_database
+    from migrations import upgrade_db
+
+    app = create_app()
     with app.app_context():
-        reset_db_on_launch = Config.RESET_DB_ON_LAUNCH
+        reset_db_on_launch = app.config["RESET_DB_ON_LAUNCH"]
         if reset_db_on_launch:
-            db.drop_all()
-            db.create_all()
-            seed_all()
+            seed_database(
+                reset=True,
+                students=app.config["SEED_STUDENTS"],
+                items=app.config["SEED_ITEMS"],
+                orders=app.config["SEED_ORDERS"],
+            )
             print("Database was reset successfully.")
         else:
-            db.create_all()
+            created = upgrade_db()
             print("Database reset skipped.")
+            if created:
+                print(f"Created indexes: {', '.join(created)}")
 
     app.run(debug=True)
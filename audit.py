@@ -0,0 +1,190 @@
+from datetime import datetime
+import atexit
+import json
+import threading
+
+from flask import current_app
+from sqlalchemy import insert, tuple_
+
+from models import db, AuditEvent
+from helpers import encode_cursor, decode_cursor
+
+
+class AuditLog:
+    """
+    Append-only log of staff actions, written off the request path.
+    - record() only appends the event to an in-memory buffer; a background
+      thread writes the buffer in batches every AUDIT_FLUSH_INTERVAL seconds,
+      or sooner once AUDIT_BATCH_SIZE events are waiting.
+    - Money-moving events are recorded with durable=True instead. They are
+      inserted in the caller's transaction, so they commit (or roll back)
+      together with the credit change they describe.
+    - If the buffer reaches AUDIT_BUFFER_SIZE, the caller writes it itself
+      rather than dropping events.
+    - Setting AUDIT_ASYNC to False writes every event straight away.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._writer = None
+        self.written = 0
+        self.batches = 0
+
+    def _start(self):
+        with self._lock:
+            if self._writer is None:
+                self._app = current_app._get_current_object()
+                self._writer = threading.Thread(
+                    target=self._run, name="audit-writer", daemon=True
+                )
+                self._writer.start()
+                atexit.register(self._flush_at_exit)
+
+    def _run(self):
+        interval = self._app.config["AUDIT_FLUSH_INTERVAL"]
+        batch_size = self._app.config["AUDIT_BATCH_SIZE"]
+        while True:
+            with self._wake:
+                self._wake.wait_for(lambda: len(self._buffer) >= batch_size, interval)
+            try:
+                with self._app.app_context():
+                    self.flush()
+            except Exception:
+                self._app.logger.exception("Writing audit events failed; will retry")
+
+    def _flush_at_exit(self):
+        with self._app.app_context():
+            self.flush()
+
+    @staticmethod
+    def _event(action, subject_type, subject_id, actor, amount, details):
+        if actor is not None and getattr(actor, "is_authenticated", True):
+            actor_id, actor_email = actor.id, actor.email
+        else:
+            actor_id, actor_email = None, None
+        return {
+            "timestamp": datetime.utcnow(),
+            "action": action,
+            "actor_id": actor_id,
+            "actor_email": actor_email,
+            "subject_type": subject_type,
+            "subject_id": subject_id,
+            "amount": amount,
+            "details": json.dumps(details, default=str) if details else None,
+        }
+
+    def record(
+        self,
+        action,
+        subject_type,
+        subject_id,
+        actor=None,
+        amount=None,
+        durable=False,
+        **details,
+    ):
+        """
+        Log that `actor` (a User, or None for the CLI) did `action` to the
+        subject, e.g. record("credit.added", "user", 3, current_user, amount=5).
+        Extra keyword arguments are stored as JSON details.
+        """
+        event = self._event(action, subject_type, subject_id, actor, amount, details)
+        self.record_many([event], durable)
+
+    def record_many(self, events, durable=False):
+        """
+        Log several events built with event() in one go. Record ordinary
+        events after the change they describe has committed, and durable ones
+        before the caller commits it.
+        """
+        if not events:
+            return
+        if durable:
+            db.session.execute(insert(AuditEvent), events)
+            return
+
+        asynchronous = current_app.config["AUDIT_ASYNC"]
+        if asynchronous and self._writer is None:
+            self._start()
+        with self._lock:
+            self._buffer.extend(events)
+            pending = len(self._buffer)
+            if pending >= current_app.config["AUDIT_BATCH_SIZE"]:
+                self._wake.notify()
+        if not asynchronous or pending >= current_app.config["AUDIT_BUFFER_SIZE"]:
+            self.flush()
+
+    def event(
+        self, action, subject_type, subject_id, actor=None, amount=None, **details
+    ):
+        """Build an event for record_many()."""
+        return self._event(action, subject_type, subject_id, actor, amount, details)
+
+    def flush(self):
+        """Write every buffered event now, in one transaction of its own."""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(AuditEvent), events)
+        except Exception:
+            with self._lock:
+                self._buffer[:0] = events  # Put them back, oldest first
+            raise
+        with self._lock:
+            self.written += len(events)
+            self.batches += 1
+
+    def stats(self):
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "batches": self.batches,
+        }
+
+
+audit_log = AuditLog()
+
+
+def query_events(
+    actor_id=None,
+    subject_type=None,
+    subject_id=None,
+    since=None,
+    until=None,
+    before=None,
+    limit=50,
+):
+    """
+    Newest audit events matching the filters, each served by one of the
+    audit_event indexes. `before` is a cursor from encode_cursor() for the
+    last event of the previous page.
+    Returns (events, cursor for the next page or None).
+    """
+    query = AuditEvent.query
+    if actor_id is not None:
+        query = query.filter(AuditEvent.actor_id == actor_id)
+    if subject_type:
+        query = query.filter(AuditEvent.subject_type == subject_type)
+        if subject_id is not None:
+            query = query.filter(AuditEvent.subject_id == subject_id)
+    if since:
+        query = query.filter(AuditEvent.timestamp >= since)
+    if until:
+        query = query.filter(AuditEvent.timestamp < until)
+    before = decode_cursor(before)
+    if before:
+        query = query.filter(tuple_(AuditEvent.timestamp, AuditEvent.id) < before)
+
+    events = (
+        query.order_by(AuditEvent.timestamp.desc(), AuditEvent.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    older = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], older
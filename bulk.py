@@ -0,0 +1,316 @@
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+import csv
+import io
+import json
+import os
+
+from sqlalchemy import bindparam, insert, update
+
+from models import db, User, Item
+from images import save_image
+from audit import audit_log
+from helpers import cents
+
+# Small enough to stay well under SQLite's limit on bound parameters
+LOOKUP_BATCH_SIZE = 500
+
+TopUpReport = namedtuple("TopUpReport", ["students", "total", "rows", "errors"])
+RowError = namedtuple("RowError", ["line", "email", "message"])
+
+ImportReport = namedtuple(
+    "ImportReport", ["created", "updated", "errors", "replaced_images"]
+)
+ItemError = namedtuple("ItemError", ["line", "name", "message"])
+
+# Columns of a menu export, and of a CSV import (image is optional)
+MENU_FIELDS = ["name", "price", "quantity", "is_vegetarian", "image"]
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+FALSE_VALUES = {"", "0", "false", "no", "n", "off"}
+
+
+def read_csv_rows(stream, header_first_cell):
+    """
+    Yield (line number, cells) for each non-empty row of a CSV text stream.
+    A first row whose first cell is `header_first_cell` is skipped.
+    """
+    for line, cells in enumerate(csv.reader(stream), start=1):
+        if not cells or not any(cell.strip() for cell in cells):
+            continue
+        if line == 1 and cells[0].strip().lower() == header_first_cell:
+            continue
+        yield line, cells
+
+
+def bulk_top_up(rows, dry_run=False, actor=None):
+    """
+    Add credit to many students at once from (line, [email, amount]) rows.
+    - Rows for the same email are added together.
+    - Emails are resolved with a few batched IN queries, not one per row.
+    - All the credit is added with one executemany UPDATE; the caller commits,
+      so the whole file lands in a single transaction.
+    - Each student's top-up is audited as done by `actor`, in that same
+      transaction.
+    Rows that can't be applied are skipped and listed in the report's errors.
+    """
+    amounts = {}
+    lines = {}
+    errors = []
+    row_count = 0
+
+    for line, cells in rows:
+        row_count += 1
+        if len(cells) < 2:
+            errors.append(RowError(line, cells[0].strip(), "Expected email,amount"))
+            continue
+        email = cells[0].strip()
+        try:
+            amount = Decimal(cells[1].strip())
+        except InvalidOperation:
+            errors.append(RowError(line, email, f"Invalid amount '{cells[1]}'"))
+            continue
+        if not amount.is_finite() or amount <= 0:
+            errors.append(RowError(line, email, "Amount must be positive"))
+            continue
+        if amount != amount.quantize(Decimal("0.01")):
+            errors.append(RowError(line, email, "Amount has more than 2 decimals"))
+            continue
+        amounts[email] = amounts.get(email, Decimal("0")) + amount
+        lines.setdefault(email, []).append(line)
+
+    emails = list(amounts)
+    students = {}
+    staff = set()
+    for start in range(0, len(emails), LOOKUP_BATCH_SIZE):
+        batch = emails[start : start + LOOKUP_BATCH_SIZE]
+        found = db.session.query(User.email, User.id, User.is_staff).filter(
+            User.email.in_(batch)
+        )
+        for email, user_id, is_staff in found:
+            if is_staff:
+                staff.add(email)
+                for line in lines[email]:
+                    errors.append(RowError(line, email, "Not a student account"))
+            else:
+                students[email] = user_id
+
+    for email in emails:
+        if email not in students and email not in staff:
+            for line in lines[email]:
+                errors.append(RowError(line, email, "Student not found"))
+
+    updates = [
+        {"user_id": user_id, "amount": amounts[email]}
+        for email, user_id in students.items()
+    ]
+    if updates and not dry_run:
+        users = User.__table__
+        db.session.execute(
+            update(users)
+            .where(users.c.id == bindparam("user_id"))
+            .values(
+                credit=cents(
+                    users.c.credit + bindparam("amount", type_=users.c.credit.type)
+                )
+            ),
+            updates,
+        )
+        audit_log.record_many(
+            [
+                audit_log.event(
+                    "credit.added",
+                    "user",
+                    user_id,
+                    actor,
+                    amount=amounts[email],
+                    email=email,
+                    bulk=True,
+                )
+                for email, user_id in students.items()
+            ],
+            durable=True,
+        )
+
+    errors.sort(key=lambda error: error.line)
+    total = sum(amounts[email] for email in students)
+    return TopUpReport(len(students), total, row_count, errors)
+
+
+def read_menu_records(stream, file_format):
+    """
+    Yield (line or position, record dict) from a CSV or JSON menu file.
+    CSV files need a header row using the MENU_FIELDS names; JSON files hold
+    a list of objects with the same keys.
+    """
+    if file_format == "json":
+        records = json.load(stream)
+        if not isinstance(records, list):
+            raise ValueError("A JSON menu must be a list of items.")
+        for position, record in enumerate(records, start=1):
+            yield position, record if isinstance(record, dict) else {}
+    else:
+        # Line numbers count the header, so they match a spreadsheet
+        for line, record in enumerate(csv.DictReader(stream), start=2):
+            yield line, record
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else "").strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid vegetarian value '{value}'")
+
+
+def _parse_item(record):
+    """Validate one menu record, raising ValueError with a readable message."""
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("Name is required")
+    try:
+        price = Decimal(str(record.get("price", "")).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid price '{record.get('price')}'")
+    if not price.is_finite() or price < 0 or price != price.quantize(Decimal("0.01")):
+        raise ValueError("Price must be a non-negative amount like 4.50")
+    try:
+        quantity = int(str(record.get("quantity", "")).strip())
+    except ValueError:
+        raise ValueError(f"Invalid quantity '{record.get('quantity')}'")
+    if quantity < 0:
+        raise ValueError("Quantity must be zero or more")
+
+    return {
+        "name": name,
+        "price": price,
+        "quantity": quantity,
+        "is_vegetarian": _parse_bool(record.get("is_vegetarian")),
+        "image": str(record.get("image") or "").strip(),
+    }
+
+
+def import_items(records, upload_folder, image_dir=None):
+    """
+    Create or update many items at once, matched on name.
+    - Existing names are looked up in a few batched IN queries.
+    - New items go in with one batched INSERT and existing ones are changed
+      with one batched UPDATE; the caller commits.
+    - image is a path relative to image_dir when one is given (it goes
+      through the upload pipeline), otherwise the name of a file already in
+      the uploads folder. A blank image leaves an existing item's image alone.
+    Records that can't be imported are skipped and listed in the errors.
+    Images that updated items no longer use are listed in replaced_images;
+    pass them to remove_image once the import has been committed.
+    """
+    items = {}
+    errors = []
+    for line, record in records:
+        try:
+            item = _parse_item(record)
+            item["image_filename"] = _resolve_image(
+                item.pop("image"), upload_folder, image_dir
+            )
+        except ValueError as error:
+            errors.append(ItemError(line, record.get("name", ""), str(error)))
+            continue
+        items[item["name"]] = item  # A later row for the same name wins
+
+    names = list(items)
+    existing = {}
+    for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+        batch = names[start : start + LOOKUP_BATCH_SIZE]
+        rows = db.session.query(Item.name, Item.id, Item.image_filename).filter(
+            Item.name.in_(batch)
+        )
+        existing.update((name, (item_id, image)) for name, item_id, image in rows)
+
+    new_rows = []
+    changed_rows = []
+    replaced_images = set()
+    for name, item in items.items():
+        if item["image_filename"] is None:
+            del item["image_filename"]
+        if name in existing:
+            item_id, old_image = existing[name]
+            if old_image and item.get("image_filename", old_image) != old_image:
+                replaced_images.add(old_image)
+            changed_rows.append({"id": item_id, **item})
+        else:
+            new_rows.append(item)
+
+    if new_rows:
+        db.session.execute(insert(Item), new_rows)
+    if changed_rows:
+        db.session.execute(update(Item), changed_rows)
+
+    errors.sort(key=lambda error: error.line)
+    return ImportReport(
+        len(new_rows), len(changed_rows), errors, sorted(replaced_images)
+    )
+
+
+def _resolve_image(image, upload_folder, image_dir):
+    if not image:
+        return None
+    if image_dir is None:
+        if os.path.basename(image) != image or not os.path.exists(
+            os.path.join(upload_folder, image)
+        ):
+            raise ValueError(f"Image '{image}' is not in the uploads folder")
+        return image
+
+    path = os.path.join(image_dir, image)
+    try:
+        with open(path, "rb") as f:
+            return save_image(f.read(), image)
+    except OSError:
+        raise ValueError(f"Image '{image}' could not be read")
+
+
+def export_items(file_format):
+    """
+    Stream every item as CSV or JSON text, in chunks, without loading the
+    whole menu into memory. The output can be imported again unchanged.
+    """
+    rows = (
+        db.session.query(
+            Item.name,
+            Item.price,
+            Item.quantity,
+            Item.is_vegetarian,
+            Item.image_filename,
+        )
+        .order_by(Item.name)
+        .yield_per(LOOKUP_BATCH_SIZE)
+    )
+
+    if file_format == "json":
+        yield "["
+        for index, row in enumerate(rows):
+            record = dict(zip(MENU_FIELDS, row))
+            record["price"] = f"{row.price:.2f}"
+            yield ("," if index else "") + "\n  " + json.dumps(record)
+        yield "\n]\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(MENU_FIELDS)
+    for index, row in enumerate(rows, start=1):
+        writer.writerow(
+            [
+                row.name,
+                f"{row.price:.2f}",
+                row.quantity,
+                "yes" if row.is_vegetarian else "no",
+                row.image_filename or "",
+            ]
+        )
+        if index % LOOKUP_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
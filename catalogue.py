@@ -0,0 +1,260 @@
+from collections import namedtuple
+import math
+import threading
+import time
+
+from flask import current_app
+
+from models import db, Item
+
+# Compact, read-only snapshot of an in-stock item. Templates use it exactly
+# like an Item, e.g. item.name and item.price.
+CatalogueItem = namedtuple(
+    "CatalogueItem",
+    [
+        "id",
+        "name",
+        "price",
+        "quantity",
+        "is_vegetarian",
+        "image_filename",
+        "search_name",
+    ],
+)
+
+# Share of a search's trigrams an item name must contain to match, so that
+# small typos ("chiken") still find the item
+MIN_SIMILARITY = 0.5
+
+
+def _trigrams(text, pad_end=True):
+    """
+    Three-letter pieces of each word, padded with two spaces in front so a
+    word's first letters are pieces too. Searches aren't padded at the end,
+    which lets "chi" match "chips" as a prefix.
+    """
+    grams = set()
+    for word in text.split():
+        padded = "  " + word + (" " if pad_end else "")
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """
+    Trigram index over the names of a catalogue snapshot.
+    - Every word of a search has to match a word in the name, as a prefix or
+      with at least MIN_SIMILARITY of its trigrams.
+    - Candidates come from each word's rarest trigrams, so a search touches
+      the items that could match, not the whole catalogue.
+    - Results are ranked by how closely they match, then by name.
+    """
+
+    def __init__(self, items):
+        self.by_id = {item.id: item for item in items}
+        self._words = {item.id: set(item.search_name.split()) for item in items}
+        self._postings = {}
+        for item in items:
+            for gram in _trigrams(item.search_name):
+                self._postings.setdefault(gram, set()).add(item.id)
+
+    def with_items(self, items):
+        """The same index over updated items (names unchanged, some removed)."""
+        index = SearchIndex.__new__(SearchIndex)
+        index.by_id = {item.id: item for item in items}
+        index._words = self._words
+        index._postings = self._postings
+        return index
+
+    def _postings_for(self, word):
+        """The posting sets of a search word's trigrams, rarest first."""
+        postings = [self._postings.get(gram, ()) for gram in _trigrams(word, False)]
+        postings.sort(key=len)
+        return postings
+
+    def _match_word(self, word, postings, candidates):
+        """{item ID: share of the word's trigrams it has} for items that match."""
+        if len(word) <= 3:
+            required = len(postings)  # Too short to guess at typos
+        else:
+            required = math.ceil(MIN_SIMILARITY * len(postings))
+        if candidates is None:
+            # An item with `required` of the trigrams has one of the rarest
+            # len - required + 1 of them
+            candidates = set().union(*postings[: len(postings) - required + 1])
+        matches = {}
+        for item_id in candidates:
+            count = sum(item_id in posting for posting in postings)
+            if count >= required:
+                matches[item_id] = count / len(postings)
+        return matches
+
+    def search(self, text):
+        """Items matching text, best match first."""
+        words = text.lower().split()
+        if not words:
+            return []
+        # Start from the word with the rarest trigram; later words only
+        # check the items still in the running
+        postings = sorted(
+            ((word, self._postings_for(word)) for word in words),
+            key=lambda pair: len(pair[1][0]),
+        )
+        scores = {}
+        candidates = None
+        for word, word_postings in postings:
+            matches = self._match_word(word, word_postings, candidates)
+            candidates = set(matches)
+            for item_id, similarity in matches.items():
+                scores[item_id] = scores.get(item_id, 0.0) + similarity
+
+        words = set(words)
+        ranked = []
+        for item_id in candidates:
+            item = self.by_id.get(item_id)
+            if item is None:
+                continue  # Sold out since the index was built
+            exact = len(words & self._words[item_id])
+            ranked.append(((-scores[item_id], -exact, item.search_name), item))
+        ranked.sort(key=lambda pair: pair[0])
+        return [item for _, item in ranked]
+
+
+class CatalogueCache:
+    """
+    In-process cache of the in-stock items shown on the store page.
+    - The whole catalogue is loaded with one query and filtered in memory.
+      Name searches go through a trigram index built at the same time, so
+      they match prefixes, tolerate typos and come back ranked.
+    - Item routes invalidate it; order placement patches stock levels in place.
+    - A TTL bounds staleness when several processes share the database.
+    - generation counts reloads and invalidations, and version() stock
+      changes on top, so pages can tell whether the menu changed without
+      looking at it.
+    """
+
+    def __init__(self):
+        self._snapshot = None  # (items, SearchIndex), replaced as a whole
+        self._loaded_at = 0.0
+        self.generation = 0
+        self._stock_updates = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _enabled(self):
+        return current_app.config.get("CATALOGUE_CACHE_ENABLED", True)
+
+    def _load(self):
+        rows = (
+            db.session.query(
+                Item.id,
+                Item.name,
+                Item.price,
+                Item.quantity,
+                Item.is_vegetarian,
+                Item.image_filename,
+            )
+            .filter(Item.quantity > 0)
+            .order_by(Item.name)
+            .all()
+        )
+        return tuple(CatalogueItem(*row, search_name=row.name.lower()) for row in rows)
+
+    def items(self):
+        """Return every in-stock item, sorted by name."""
+        return self._current()[0]
+
+    def _current(self):
+        """The cached (items, search index) pair, reloading it when stale."""
+        if not self._enabled():
+            items = self._load()
+            return items, SearchIndex(items)
+
+        ttl = current_app.config.get("CATALOGUE_CACHE_TTL", 300)
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < ttl:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            self.misses += 1
+            items = self._load()
+            self._snapshot = items, SearchIndex(items)
+            self._loaded_at = time.monotonic()
+            self.generation += 1
+            return self._snapshot
+
+    def version(self):
+        """
+        Marker that changes whenever the in-stock items change, reloading
+        the catalogue first if it is stale. None when the cache is off.
+        """
+        if not self._enabled():
+            return None
+        self._current()
+        return self.generation, self._stock_updates
+
+    def search(
+        self,
+        name="",
+        min_price=None,
+        max_price=None,
+        min_quantity=None,
+        vegetarian_only=False,
+    ):
+        """
+        Filter the catalogue the same way the store page's form does.
+        With a name, items come back best match first; otherwise by name.
+        """
+        items, index = self._current()
+        if name.strip():
+            items = index.search(name)
+        return [
+            item
+            for item in items
+            if (min_price is None or item.price >= min_price)
+            and (max_price is None or item.price <= max_price)
+            and (min_quantity is None or item.quantity >= min_quantity)
+            and (not vegetarian_only or item.is_vegetarian)
+        ]
+
+    def invalidate(self):
+        """Drop the cached catalogue so the next read reloads it."""
+        with self._lock:
+            self._snapshot = None
+            self.generation += 1
+
+    def update_stock(self, quantities):
+        """
+        Patch stock levels after an order commits.
+        quantities maps item IDs to their new quantity in the database.
+        Items that sell out are dropped from the catalogue.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                return
+            cached, index = self._snapshot
+            items = tuple(
+                (
+                    item._replace(quantity=quantities[item.id])
+                    if item.id in quantities
+                    else item
+                )
+                for item in cached
+                if quantities.get(item.id, item.quantity) > 0
+            )
+            self._snapshot = items, index.with_items(items)
+            self._stock_updates += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "cached_items": len(self._snapshot[0]) if self._snapshot else 0,
+        }
+
+
+catalogue = CatalogueCache()
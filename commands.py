@@ -0,0 +1,186 @@
+from flask import Blueprint, current_app
+from models import db, User
+from migrations import upgrade_db
+from catalogue import catalogue
+from fragments import fragment_cache
+from rollups import rebuild_rollups
+from slots import forget_slots, recount_slots
+from images import remove_image, backfill_images
+import click
+
+# Commands are registered at the top level, e.g. "flask --app app seed".
+# Modules only they use are imported inside them, so web workers never load
+# them.
+bp = Blueprint("commands", __name__, cli_group=None)
+
+
+def seed_database(reset=False, students=0, items=0, orders=0):
+    """
+    Add the example users, items and orders (plus any extra ones, see
+    seed_db.seed_all), after recreating every table if reset is set and
+    upgrading the existing ones otherwise.
+    """
+    from seed_db import seed_all
+
+    if reset:
+        db.drop_all()
+        db.create_all()
+        forget_slots()
+    else:
+        upgrade_db()
+    seed_all(students, items, orders)
+    catalogue.invalidate()
+    fragment_cache.bump("item")
+
+
+@bp.cli.command("seed")
+@click.option("--reset", is_flag=True, help="Drop and recreate every table first.")
+@click.option("--students", type=int, help="Extra students. [default: SEED_STUDENTS]")
+@click.option(
+    "--items", "item_count", type=int, help="Extra items. [default: SEED_ITEMS]"
+)
+@click.option("--orders", type=int, help="Extra orders. [default: SEED_ORDERS]")
+def seed_command(reset, students, item_count, orders):
+    """Seed the database with the example users, items and orders."""
+    config = current_app.config
+    seed_database(
+        reset,
+        config["SEED_STUDENTS"] if students is None else students,
+        config["SEED_ITEMS"] if item_count is None else item_count,
+        config["SEED_ORDERS"] if orders is None else orders,
+    )
+    print("Database was reset successfully." if reset else "Database seeded.")
+
+
+@bp.cli.command("upgrade-db")
+def upgrade_db_command():
+    """Create missing tables, columns and indexes in an existing database."""
+    created = upgrade_db()
+    if created:
+        print(f"Created indexes: {', '.join(created)}")
+    print("Database is up to date.")
+
+
+@bp.cli.command("backfill-images")
+def backfill_images_command():
+    """Rename older item images by content hash and build missing variants."""
+    replaced = backfill_images()
+    db.session.commit()
+    catalogue.invalidate()
+    fragment_cache.bump("item")
+    for filename in replaced:
+        remove_image(filename)
+    print(f"Backfilled {len(replaced)} image(s).")
+
+
+@bp.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the performance dashboard's rollups from the order tables."""
+    rebuild_rollups()
+    db.session.commit()
+    print("Rebuilt the performance rollups.")
+
+
+@bp.cli.command("recount-slots")
+def recount_slots_command():
+    """Recompute every pickup slot's booked orders and units from the orders."""
+    recount_slots()
+    db.session.commit()
+    print("Recounted the pickup slot bookings.")
+
+
+@bp.cli.command("generate-data")
+@click.option("--students", default=5000, show_default=True)
+@click.option("--staff", default=10, show_default=True)
+@click.option("--items", "item_count", default=200, show_default=True)
+@click.option("--orders", default=2_000_000, show_default=True)
+@click.option("--days", default=50, show_default=True, help="School days of history.")
+@click.option("--active-orders", default=200, show_default=True)
+@click.option("--seed", default=1, show_default=True)
+@click.option("--reset", is_flag=True, help="Empty the database first.")
+def generate_data_command(
+    students, staff, item_count, orders, days, active_orders, seed, reset
+):
+    """Fill the database with a synthetic school, for load testing."""
+    from synthetic import generate_dataset
+
+    if reset:
+        db.drop_all()
+        db.create_all()
+        forget_slots()
+    elif User.query.filter_by(email="student1@school.com").first():
+        raise click.ClickException("Synthetic data is already loaded; use --reset.")
+
+    generate_dataset(
+        students=students,
+        staff=staff,
+        items=item_count,
+        orders=orders,
+        days=days,
+        active_orders=active_orders,
+        seed=seed,
+    )
+    db.session.commit()
+    catalogue.invalidate()
+    fragment_cache.bump("item")
+    print("Synthetic data generated.")
+
+
+@bp.cli.command("bulk-credit")
+@click.argument("csv_file", type=click.File(encoding="utf-8-sig"))
+@click.option("--dry-run", is_flag=True, help="Check the file without adding credit.")
+def bulk_credit_command(csv_file, dry_run):
+    """Top up students from a CSV of email,amount rows."""
+    from bulk import bulk_top_up, read_csv_rows
+
+    report = bulk_top_up(read_csv_rows(csv_file, header_first_cell="email"), dry_run)
+    db.session.commit()
+    for error in report.errors:
+        print(f"Line {error.line} ({error.email}): {error.message}")
+    verb = "Would add" if dry_run else "Added"
+    print(
+        f"{verb} ${report.total:.2f} to {report.students} student(s) "
+        f"from {report.rows} row(s); {len(report.errors)} row(s) skipped."
+    )
+
+
+@bp.cli.command("import-items")
+@click.argument("menu_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--images",
+    type=click.Path(exists=True, file_okay=False),
+    help="Folder that image paths in the file are relative to.",
+)
+def import_items_command(menu_file, images):
+    """Create or update items from a CSV or JSON menu file."""
+    from bulk import import_items, read_menu_records
+    from images import remove_image
+
+    file_format = "json" if menu_file.lower().endswith(".json") else "csv"
+    with open(menu_file, encoding="utf-8-sig", newline="") as stream:
+        report = import_items(
+            read_menu_records(stream, file_format),
+            current_app.config["UPLOAD_FOLDER"],
+            image_dir=images,
+        )
+    db.session.commit()
+    for filename in report.replaced_images:
+        remove_image(filename)  # Kept if another item shares it
+    for error in report.errors:
+        print(f"Line {error.line} ({error.name}): {error.message}")
+    print(
+        f"Created {report.created} and updated {report.updated} item(s); "
+        f"{len(report.errors)} row(s) skipped."
+    )
+
+
+@bp.cli.command("export-items")
+@click.option(
+    "--format", "file_format", type=click.Choice(["csv", "json"]), default="csv"
+)
+def export_items_command(file_format):
+    """Write every item to standard output as CSV or JSON."""
+    from bulk import export_items
+
+    for chunk in export_items(file_format):
+        click.echo(chunk, nl=False)
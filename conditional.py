@@ -0,0 +1,52 @@
+import hashlib
+import os
+
+from flask import make_response, request, session
+from flask_login import current_user
+
+# Version markers like the catalogue's counters only mean something inside
+# one process, so every ETag carries this and never matches another process
+PROCESS_TOKEN = os.urandom(8).hex()
+
+
+def page_etag(*versions):
+    """
+    Strong ETag for a student page, from cheap markers that change whenever
+    its content does.
+    - versions describe the page's own content (e.g. the catalogue version).
+    - The navbar's credit and cart count, and the query string, are added
+      here, since every student page shows them.
+    """
+    parts = (
+        PROCESS_TOKEN,
+        request.endpoint,
+        request.query_string,
+        current_user.id,
+        current_user.credit,
+        sum(session.get("cart", {}).values()),
+        versions,
+    )
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def conditional_page(etag, render):
+    """
+    Answer a GET whose whole page is described by etag.
+    - When the client's If-None-Match holds etag, an empty 304 is returned
+      without calling render, so the page's queries never run.
+    - Otherwise render() builds the page, which is tagged with etag.
+    - Pages are private and no-cache: browsers keep them, but check back on
+      every visit.
+    - Pages with flashed messages waiting are always rendered, so the
+      messages are shown, as are pages without an etag.
+    """
+    if etag is None or session.get("_flashes"):
+        return render()
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -1,3 +1,4 @@
+from datetime import datetime
 import os
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -9,5 +10,101 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "this-is-not-secure"
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool settings, e.g. SQLALCHEMY_POOL_SIZE=10. Unset ones keep
+    # SQLAlchemy's defaults.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        option: cast(os.environ[name])
+        for name, option, cast in [
+            ("SQLALCHEMY_POOL_SIZE", "pool_size", int),
+            ("SQLALCHEMY_MAX_OVERFLOW", "max_overflow", int),
+            ("SQLALCHEMY_POOL_TIMEOUT", "pool_timeout", float),
+            ("SQLALCHEMY_POOL_RECYCLE", "pool_recycle", int),
+            ("SQLALCHEMY_POOL_PRE_PING", "pool_pre_ping", lambda v: v == "true"),
+        ]
+        if os.environ.get(name)
+    }
     MAX_CONTENT_LENGTH = 2 * 1024 * 1024  # 2 MB
     RESET_DB_ON_LAUNCH = False
+    # Extra students, items and orders added when the database is reset
+    # (see seed_db.seed_volume), for trying the app at a realistic size
+    SEED_STUDENTS = int(os.environ.get("SEED_STUDENTS", 0))
+    SEED_ITEMS = int(os.environ.get("SEED_ITEMS", 0))
+    SEED_ORDERS = int(os.environ.get("SEED_ORDERS", 0))
+
+    # In-process cache of the store catalogue (see catalogue.py)
+    CATALOGUE_CACHE_ENABLED = True
+    CATALOGUE_CACHE_TTL = 300  # seconds before a reload, even without writes
+
+    # Rendered item cards and order rows (see fragments.py)
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", 5000))
+
+    # How often the in-process order status counts are checked against the table
+    ORDER_COUNTER_RECONCILE_INTERVAL = 60  # seconds
+
+    # Kitchen queue and wait estimates (see kitchen.py)
+    KITCHEN_STATIONS = int(os.environ.get("KITCHEN_STATIONS", 2))  # Orders made at once
+    KITCHEN_DEFAULT_PREP_SECONDS = 120  # Per unit, for items with no history yet
+    KITCHEN_EWMA_ALPHA = 0.2  # Weight of each new prep time in an item's estimate
+    KITCHEN_HISTORY_ORDERS = 500  # Recent orders replayed into the estimates
+    KITCHEN_REBUILD_INTERVAL = 60  # seconds between reloads of the queue
+
+    # Pickup slots students can book when ordering (see slots.py). Times are
+    # slot starts on the school's clock, e.g. PICKUP_SLOT_TIMES="12:45, 13:00";
+    # a time that can't be read stops the app from starting.
+    SCHOOL_TIMEZONE = os.environ.get("SCHOOL_TIMEZONE", "Australia/Sydney")
+    PICKUP_SLOT_TIMES = [
+        datetime.strptime(start.strip(), "%H:%M").time()
+        for start in os.environ.get(
+            "PICKUP_SLOT_TIMES", "10:45,11:00,12:45,13:00,13:15"
+        ).split(",")
+        if start.strip()
+    ]
+    PICKUP_SLOT_MINUTES = 15  # Length of each slot
+    PICKUP_SLOT_MAX_ORDERS = int(os.environ.get("PICKUP_SLOT_MAX_ORDERS", 40))
+    PICKUP_SLOT_MAX_UNITS = int(os.environ.get("PICKUP_SLOT_MAX_UNITS", 80))
+    PICKUP_SLOT_CUTOFF_MINUTES = 10  # Booking closes this long before a slot
+    PICKUP_SLOT_DAYS = 2  # School days open for booking, starting today
+
+    # Number of completed/cancelled orders per page on the manage orders page
+    CLOSED_ORDERS_PER_PAGE = int(os.environ.get("CLOSED_ORDERS_PER_PAGE", 5))
+
+    # Item image pipeline (see images.py)
+    IMAGE_THUMBNAIL_SIZE = (600, 450)  # Largest thumbnail width and height
+    IMAGE_QUALITY = 80  # JPEG and WebP quality
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 60 * 60  # One year, in seconds
+
+    # Password hashing (see passwords.py). Changing the method upgrades each
+    # user's hash the next time they log in.
+    PASSWORD_HASH_METHOD = os.environ.get(
+        "PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000"
+    )
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", 64))
+
+    # Audit log (see audit.py). Money-moving events are written in the same
+    # transaction as the change; others are buffered and written in batches.
+    AUDIT_ASYNC = os.environ.get("AUDIT_ASYNC", "true").lower() == "true"
+    AUDIT_FLUSH_INTERVAL = 2  # seconds between background writes
+    AUDIT_BATCH_SIZE = 200  # events that trigger a write before the interval
+    AUDIT_BUFFER_SIZE = 5000  # events held before callers write them themselves
+
+    # Request metrics (see metrics.py), served at /metrics to staff, and to
+    # scrapers sending "Authorization: Bearer <METRICS_TOKEN>" when it is set
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    # Requests slower than this are logged with the SQL statements they ran
+    METRICS_SLOW_REQUEST_MS = int(os.environ.get("METRICS_SLOW_REQUEST_MS", 500))
+
+    # SQLite connection profile, applied to every new connection (see
+    # pragmas.py). Set SQLITE_TUNING_ENABLED=false for SQLite's own defaults.
+    SQLITE_TUNING_ENABLED = (
+        os.environ.get("SQLITE_TUNING_ENABLED", "true").lower() == "true"
+    )
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))  # ms
+    # Negative sizes are in KiB: 64 MB of page cache per connection
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "MEMORY")
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, Order, ACTIVE_STATUSES
+
+
+class OrderStatusCounter:
+    """
+    In-process count of orders per status, so the staff navbar can show the
+    number of active orders without querying the order table on every page.
+    - Seeded from a single GROUP BY query on first use.
+    - Kept up to date by the code paths that place, advance and cancel orders.
+    - Reconciled against the table every ORDER_COUNTER_RECONCILE_INTERVAL
+      seconds, which also picks up orders written by other processes.
+    """
+
+    def __init__(self):
+        self._counts = None
+        self._reconciled_at = 0.0
+        self._lock = threading.Lock()
+
+    def _count_from_db(self):
+        rows = (
+            db.session.query(Order.status, func.count(Order.id))
+            .group_by(Order.status)
+            .all()
+        )
+        return dict(rows)
+
+    def reconcile(self):
+        """Replace the counts with the real ones, logging any drift."""
+        counts = self._count_from_db()
+        with self._lock:
+            if self._counts is not None and self._counts != counts:
+                current_app.logger.warning(
+                    "Order status counter drifted: had %s, table has %s",
+                    self._counts,
+                    counts,
+                )
+            self._counts = counts
+            self._reconciled_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        interval = current_app.config.get("ORDER_COUNTER_RECONCILE_INTERVAL", 60)
+        if self._counts is None or time.monotonic() - self._reconciled_at >= interval:
+            self.reconcile()
+
+    def record(self, old_status, new_status):
+        """
+        Move one order between statuses after its change has been committed.
+        Pass None as old_status for a newly placed order.
+        """
+        with self._lock:
+            if self._counts is None:
+                return  # Not seeded yet; the first read will count the table
+            if old_status is not None:
+                self._counts[old_status] = self._counts.get(old_status, 0) - 1
+            self._counts[new_status] = self._counts.get(new_status, 0) + 1
+
+    def count(self, *statuses):
+        self._ensure_fresh()
+        return sum(self._counts.get(status, 0) for status in statuses)
+
+    def active_count(self):
+        return self.count(*ACTIVE_STATUSES)
+
+
+order_counter = OrderStatusCounter()
@@ -0,0 +1,89 @@
+import json
+import queue
+import threading
+
+from flask import Response
+
+
+class Subscription:
+    """A single open event stream, optionally limited to one student's orders."""
+
+    def __init__(self, user_id=None, max_pending=100):
+        self.user_id = user_id
+        self.messages = queue.Queue(maxsize=max_pending)
+
+    def wants(self, event):
+        return self.user_id is None or event["user_id"] == self.user_id
+
+
+class EventBus:
+    """
+    In-process fan-out of order events to open server-sent event streams.
+    - Write paths publish an event once, with everything the pages need to
+      render it, so listeners never have to query the database themselves.
+    - Each listener has a bounded queue; a listener that stops reading is
+      dropped instead of holding up the write path.
+    - Events only reach streams in this process, so the app is served by a
+      single process with a threaded worker (see the README).
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, **data):
+        event = {"type": event_type, **data}
+        # Formatted once here, not once per listener
+        message = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.messages.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(subscription)
+
+    def subscribe(self, user_id=None):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def listener_count(self):
+        return len(self._subscriptions)
+
+    def stream(self, user_id=None, keepalive=15):
+        """
+        Yield server-sent event messages for one client until it disconnects.
+        A comment line is sent every `keepalive` seconds so idle connections
+        stay open and dead ones are noticed.
+        """
+        subscription = self.subscribe(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            while subscription in self._subscriptions:
+                try:
+                    yield subscription.messages.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+
+def event_stream_response(messages):
+    """Wrap an event generator in a response that proxies won't buffer."""
+    return Response(
+        messages,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+order_events = EventBus()
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileField, FileAllowed
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import (
     StringField,
     PasswordField,
@@ -7,6 +7,7 @@ from wtforms import (
     BooleanField,
     DecimalField,
     IntegerField,
+    SelectField,
 )
 from wtforms.validators import (
     DataRequired,
@@ -82,6 +83,15 @@ class CreditForm(FlaskForm):
     submit = SubmitField("Add Credit")
 
 
+class BulkCreditForm(FlaskForm):
+    csv_file = FileField(
+        "CSV File (email,amount)",
+        validators=[FileRequired(), FileAllowed(["csv"], "CSV files only!")],
+    )
+    dry_run = BooleanField("Check only (don't add any credit)")
+    submit = SubmitField("Upload")
+
+
 class ItemForm(FlaskForm):
     name = StringField("Item Name", validators=[DataRequired()])
     price = DecimalField("Price", validators=[DataRequired(), NumberRange(min=0)])
@@ -93,6 +103,14 @@ class ItemForm(FlaskForm):
     submit = SubmitField("Save Item")
 
 
+class ItemImportForm(FlaskForm):
+    menu_file = FileField(
+        "Menu File (CSV or JSON)",
+        validators=[FileRequired(), FileAllowed(["csv", "json"], "CSV or JSON only!")],
+    )
+    submit = SubmitField("Import")
+
+
 class OrderForm(FlaskForm):
     quantity = IntegerField(
         "Quantity",
@@ -101,4 +119,12 @@ class OrderForm(FlaskForm):
             NumberRange(min=1, message="Quantity must be at least 1"),
         ],
     )
+    # Choices are the open slots (see slots.slot_choices); 0 is as soon as possible
+    pickup_slot = SelectField("Pickup", coerce=int, default=0)
+    submit = SubmitField("Place Order")
+    add_to_cart = SubmitField("Add to Cart")
+
+
+class CheckoutForm(FlaskForm):
+    pickup_slot = SelectField("Pickup", coerce=int, default=0)
     submit = SubmitField("Place Order")
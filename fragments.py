@@ -0,0 +1,99 @@
+from collections import OrderedDict
+import threading
+
+from flask import current_app, get_template_attribute
+
+# Tables whose changes can alter a fragment in ways its key doesn't show,
+# e.g. an item renamed after it was ordered
+FRAGMENT_TABLES = {
+    "store_card": ("item",),
+    "active_order_row": ("item",),
+    "closed_order_row": ("item",),
+}
+
+
+class FragmentCache:
+    """
+    In-process LRU of rendered template fragments: the store's item cards
+    and the rows of the manage orders page.
+    - Fragments are macros in templates/fragments.html. Templates call
+      cached_fragment(macro, key, *args) and get the macro's markup, rendered
+      once per key.
+    - Keys hold the row data the fragment shows (an item's catalogue entry,
+      an order's ID and status), plus a generation counter for each table in
+      FRAGMENT_TABLES. Write routes bump the counter, so every fragment
+      depending on that table is rendered afresh next time.
+    - Fragments never contain anything user-specific (credit, CSRF tokens);
+      those stay in the page around them.
+    - At most FRAGMENT_CACHE_SIZE fragments are kept; the least recently used
+      go first.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bump(self, *tables):
+        """Mark tables as changed, retiring every fragment that depends on them."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def _cache_key(self, macro, key):
+        generations = tuple(
+            self._generations.get(table, 0) for table in FRAGMENT_TABLES[macro]
+        )
+        return macro, generations, key
+
+    def missing(self, macro, keys):
+        """
+        The keys that have no cached fragment yet, so a route can load the
+        data behind a fragment only when it will actually be rendered.
+        """
+        if not current_app.config["FRAGMENT_CACHE_ENABLED"]:
+            return list(keys)
+        with self._lock:
+            return [
+                key for key in keys if self._cache_key(macro, key) not in self._entries
+            ]
+
+    def render(self, macro, key, *args):
+        """The macro's markup for args, from the cache when key was seen before."""
+        if not current_app.config["FRAGMENT_CACHE_ENABLED"]:
+            return get_template_attribute("fragments.html", macro)(*args)
+
+        cache_key = self._cache_key(macro, key)
+        with self._lock:
+            html = self._entries.get(cache_key)
+            if html is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = get_template_attribute("fragments.html", macro)(*args)
+        with self._lock:
+            self._entries[cache_key] = html
+            # Fragments from older generations are never read again, so they
+            # drift to the front and go first
+            while len(self._entries) > current_app.config["FRAGMENT_CACHE_SIZE"]:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return html
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+
+fragment_cache = FragmentCache()
@@ -1,4 +1,58 @@
-from models import OrderStatus
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+
+from sqlalchemy import bindparam, case, func, insert, select, tuple_, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import (
+    db,
+    User,
+    Item,
+    Order,
+    OrderLine,
+    OrderStatus,
+    ACTIVE_STATUSES,
+    STATUS_TIMESTAMPS,
+)
+from catalogue import catalogue
+from counters import order_counter
+from events import order_events
+from slots import book_slot, pickup_label, release_slots
+from rollups import (
+    record_order_placed,
+    record_order_cancelled,
+    record_cancellations,
+    record_transitions,
+)
+
+
+class PlaceOrderResult(Enum):
+    PLACED = "placed"
+    OUT_OF_STOCK = "out_of_stock"
+    INSUFFICIENT_CREDIT = "insufficient_credit"
+    SLOT_FULL = "slot_full"
+
+
+# One page of orders plus the cursors for the pages either side of it
+# (None when there is no such page)
+KeysetPage = namedtuple("KeysetPage", ["items", "newer", "older"])
+
+# One order changed by a bulk action; refund is the credit returned to the
+# student (zero unless the order was cancelled)
+OrderChange = namedtuple(
+    "OrderChange", ["order_id", "user_id", "old_status", "new_status", "refund"]
+)
+
+
+def cents(amount):
+    """
+    Round a credit amount worked out in SQL back to whole cents. SQLite keeps
+    NUMERIC values as floats, so unrounded sums drift (0.30 - 0.10 - 0.10 is
+    0.09999999999999998) and later guards like credit >= cost fail.
+    """
+    return func.round(amount, 2)
 
 
 def get_next_status(current):
@@ -14,3 +68,373 @@ def get_next_status(current):
         return flow[index + 1] if index + 1 < len(flow) else current
     except ValueError:
         return current  # fallback if unknown status
+
+
+def place_order(user, lines, pickup_slot_id=None):
+    """
+    Deduct stock and credit, book the pickup slot and create the order in one
+    short transaction.
+    - lines is a list of (item, quantity) pairs with the items already loaded.
+    - pickup_slot_id is the slot to collect the order in, or None for as
+      soon as possible.
+    - All three deductions are guarded UPDATEs (e.g. quantity >= n) so
+      concurrent orders can never oversell an item, push credit below zero
+      or overbook a slot.
+    - Stock for every line is deducted by a single CASE statement and the
+      lines are inserted in one batch, so the number of round trips does not
+      grow with the size of the basket.
+    - If a guard matches no row, another order got there first: the
+      transaction is rolled back and the reason is returned.
+    Returns a (PlaceOrderResult, order) tuple; order is None unless placed.
+    """
+    user_id = user.id
+    quantities = {}
+    prices = {}
+    names = {}
+    for item, quantity in lines:
+        quantities[item.id] = quantities.get(item.id, 0) + quantity
+        prices[item.id] = item.price
+        names[item.id] = item.name
+    total_cost = sum(prices[item_id] * qty for item_id, qty in quantities.items())
+
+    requested = case(quantities, value=Item.id)
+    remaining_stock = dict(
+        db.session.execute(
+            update(Item)
+            .where(Item.id.in_(quantities), Item.quantity >= requested)
+            .values(quantity=Item.quantity - requested)
+            .returning(Item.id, Item.quantity),
+            execution_options={"synchronize_session": False},
+        ).all()
+    )
+    if len(remaining_stock) != len(quantities):
+        db.session.rollback()
+        return PlaceOrderResult.OUT_OF_STOCK, None
+
+    credit = db.session.execute(
+        update(User)
+        .where(User.id == user_id, cents(User.credit - total_cost) >= 0)
+        .values(credit=cents(User.credit - total_cost)),
+        execution_options={"synchronize_session": False},
+    )
+    if credit.rowcount != 1:
+        db.session.rollback()
+        return PlaceOrderResult.INSUFFICIENT_CREDIT, None
+
+    pickup = "ASAP"
+    if pickup_slot_id is not None:
+        starts_at = book_slot(pickup_slot_id, sum(quantities.values()))
+        if starts_at is None:
+            db.session.rollback()
+            return PlaceOrderResult.SLOT_FULL, None
+        pickup = pickup_label(starts_at)
+
+    order = Order(
+        user_id=user_id,
+        total_cost=total_cost,
+        status=OrderStatus.AWAITING.value,
+        pickup_slot_id=pickup_slot_id,
+    )
+    db.session.add(order)
+    db.session.flush()  # Assigns order.id for the lines below
+    db.session.execute(
+        insert(OrderLine),
+        [
+            {
+                "order_id": order.id,
+                "item_id": item_id,
+                "quantity": qty,
+                "unit_price": prices[item_id],
+            }
+            for item_id, qty in quantities.items()
+        ],
+    )
+    record_order_placed(
+        order.timestamp,
+        {item_id: (qty, prices[item_id]) for item_id, qty in quantities.items()},
+    )
+    # Everything the live order pages show, read before commit expires it
+    event = order_event_data(order, user.email)
+    event["lines"] = [
+        f"{qty} x {names[item_id]}" for item_id, qty in quantities.items()
+    ]
+    event["pickup"] = pickup
+
+    db.session.commit()  # Also expires the stale in-memory items and user
+    catalogue.update_stock(remaining_stock)
+    order_counter.record(None, OrderStatus.AWAITING.value)
+    order_events.publish(
+        "order-created", active_order_count=order_counter.active_count(), **event
+    )
+    return PlaceOrderResult.PLACED, order
+
+
+def order_event_data(order, email):
+    """Describe an order for the live order pages (see events.py)."""
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "email": email,
+        "total_cost": f"{order.total_cost:.2f}",
+        "status": order.status,
+        "timestamp": order.timestamp.strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+def change_order_status(order, new_status):
+    """
+    Move an order to new_status (a status value), recording when it happened
+    and how long the order spent in its previous status (see rollups.py).
+    - The move is the bulk actions' guarded UPDATE (see _move_orders), so it
+      only happens if the order is still in the status it was loaded with.
+      Two staff changing the same order at once, or a double submit, move
+      it once.
+    The caller is responsible for committing. Returns whether the order moved.
+    """
+    now = datetime.utcnow()
+    if not _move_orders([order], order.status, new_status, now):
+        return False
+    # Already written by the UPDATE; keep the loaded order in step without
+    # making it dirty
+    set_committed_value(order, "status", new_status)
+    set_committed_value(order, STATUS_TIMESTAMPS[new_status], now)
+    return True
+
+
+def cancel_order(order):
+    """
+    Cancel an order, refund its full cost and return every line's stock and
+    its pickup slot's capacity.
+    - Nothing is refunded or returned unless the order's own guarded status
+      change goes through (see change_order_status), so an order can't be
+      refunded twice.
+    - Uses SQL-side increments so a concurrent order can't be overwritten.
+    The caller is responsible for committing. Returns whether the order was
+    cancelled.
+    """
+    if not change_order_status(order, OrderStatus.CANCELLED.value):
+        return False
+
+    returned = {}
+    for line in order.lines:
+        returned[line.item_id] = returned.get(line.item_id, 0) + line.quantity
+    if order.pickup_slot_id is not None:
+        release_slots({order.pickup_slot_id: (1, sum(returned.values()))})
+
+    db.session.execute(
+        update(Item)
+        .where(Item.id.in_(returned))
+        .values(quantity=Item.quantity + case(returned, value=Item.id)),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.execute(
+        update(User)
+        .where(User.id == order.user_id)
+        .values(credit=cents(User.credit + order.total_cost)),
+        execution_options={"synchronize_session": False},
+    )
+    record_order_cancelled(order)
+    return True
+
+
+def _orders_by_status(order_ids, statuses):
+    """Load what bulk actions need about the given orders, grouped by status."""
+    rows = db.session.execute(
+        select(
+            Order.id,
+            Order.user_id,
+            Order.status,
+            Order.total_cost,
+            Order.timestamp,
+            Order.confirmed_at,
+            Order.preparing_at,
+            Order.ready_at,
+            Order.completed_at,
+            Order.pickup_slot_id,
+        ).where(Order.id.in_(order_ids), Order.status.in_(statuses))
+    )
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.status, []).append(row)
+    return groups
+
+
+def _status_since(row):
+    column = STATUS_TIMESTAMPS.get(row.status)
+    return getattr(row, column) if column else row.timestamp
+
+
+def _move_orders(rows, old_status, new_status, now):
+    """
+    Move a group of orders that share a status with one guarded UPDATE.
+    Returns the rows that actually moved; any changed by someone else in the
+    meantime no longer match the status guard and are left alone.
+    """
+    moved = set(
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_([row.id for row in rows]), Order.status == old_status)
+            .values({"status": new_status, STATUS_TIMESTAMPS[new_status]: now})
+            .returning(Order.id),
+            execution_options={"synchronize_session": False},
+        ).scalars()
+    )
+    rows = [row for row in rows if row.id in moved]
+    record_transitions(
+        old_status, new_status, [_status_since(row) for row in rows], now
+    )
+    return rows
+
+
+def bulk_advance_orders(order_ids):
+    """
+    Advance many orders one step each (see get_next_status).
+    - Orders are grouped by their current status and each group is moved with
+      one set-based UPDATE, so the statement count depends on the number of
+      statuses involved, not the number of orders.
+    - Closed orders are skipped.
+    The caller is responsible for committing. Returns a list of OrderChange.
+    """
+    now = datetime.utcnow()
+    changes = []
+    for status, rows in _orders_by_status(order_ids, ACTIVE_STATUSES).items():
+        next_status = get_next_status(status)
+        for row in _move_orders(rows, status, next_status, now):
+            changes.append(
+                OrderChange(row.id, row.user_id, status, next_status, Decimal("0"))
+            )
+    return changes
+
+
+def bulk_cancel_orders(order_ids):
+    """
+    Cancel many orders, refunding their cost and returning their stock and
+    pickup slot capacity.
+    - Orders are moved to Cancelled with one guarded UPDATE per current status.
+    - Refunds are added up per student and applied with one executemany
+      UPDATE; returned stock is added up per item and slot capacity per
+      slot, each applied with one CASE UPDATE, like cancel_order.
+    - Already cancelled orders are skipped.
+    The caller is responsible for committing, so the whole batch lands in
+    one transaction. Returns a list of OrderChange.
+    """
+    now = datetime.utcnow()
+    cancelled = OrderStatus.CANCELLED.value
+    statuses = [status.value for status in OrderStatus if status.value != cancelled]
+    rows = []
+    changes = []
+    for status, group in _orders_by_status(order_ids, statuses).items():
+        for row in _move_orders(group, status, cancelled, now):
+            rows.append(row)
+            changes.append(
+                OrderChange(row.id, row.user_id, status, cancelled, row.total_cost)
+            )
+    if not rows:
+        return changes
+
+    placed_at = {row.id: row.timestamp for row in rows}
+    lines = db.session.execute(
+        select(
+            OrderLine.order_id,
+            OrderLine.item_id,
+            OrderLine.quantity,
+            OrderLine.unit_price,
+        ).where(OrderLine.order_id.in_(placed_at))
+    ).all()
+    returned = {}
+    for line in lines:
+        returned[line.item_id] = returned.get(line.item_id, 0) + line.quantity
+    refunds = {}
+    for row in rows:
+        refunds[row.user_id] = refunds.get(row.user_id, Decimal("0")) + row.total_cost
+    units = {}
+    for line in lines:
+        units[line.order_id] = units.get(line.order_id, 0) + line.quantity
+    bookings = {}
+    for row in rows:
+        if row.pickup_slot_id is not None:
+            orders, booked = bookings.get(row.pickup_slot_id, (0, 0))
+            bookings[row.pickup_slot_id] = (orders + 1, booked + units.get(row.id, 0))
+
+    db.session.execute(
+        update(Item)
+        .where(Item.id.in_(returned))
+        .values(quantity=Item.quantity + case(returned, value=Item.id)),
+        execution_options={"synchronize_session": False},
+    )
+    users = User.__table__
+    db.session.execute(
+        update(users)
+        .where(users.c.id == bindparam("user_id"))
+        .values(
+            credit=cents(
+                users.c.credit + bindparam("refund", type_=users.c.credit.type)
+            )
+        ),
+        [{"user_id": user_id, "refund": refund} for user_id, refund in refunds.items()],
+    )
+    release_slots(bookings)
+    record_cancellations(
+        [
+            (placed_at[line.order_id], line.item_id, line.quantity, line.unit_price)
+            for line in lines
+        ],
+        list(placed_at.values()),
+    )
+    return changes
+
+
+def encode_cursor(order):
+    """Turn an order's (timestamp, id) sort key into a URL-safe cursor."""
+    return f"{order.timestamp:%Y%m%d%H%M%S%f}-{order.id}"
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from encode_cursor, or return None if it is invalid."""
+    try:
+        stamp, order_id = cursor.split("-")
+        return datetime.strptime(stamp, "%Y%m%d%H%M%S%f"), int(order_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_paginate(query, before=None, after=None, per_page=5):
+    """
+    Page through orders newest first without OFFSET or COUNT(*).
+    - before/after are cursors for the oldest/newest row of the page the
+      user came from; with neither, the newest page is returned.
+    - Each page is a range seek on the (status, timestamp) index, so the cost
+      stays the same however much order history there is.
+    """
+    sort_key = tuple_(Order.timestamp, Order.id)
+    before = decode_cursor(before)
+    after = decode_cursor(after)
+
+    if after:
+        # Walk forwards from the cursor, then flip back to newest first
+        rows = (
+            query.filter(sort_key > after)
+            .order_by(Order.timestamp, Order.id)
+            .limit(per_page + 1)
+            .all()
+        )
+        has_newer = len(rows) > per_page
+        has_older = True
+        rows = rows[:per_page][::-1]
+    else:
+        if before:
+            query = query.filter(sort_key < before)
+        rows = (
+            query.order_by(Order.timestamp.desc(), Order.id.desc())
+            .limit(per_page + 1)
+            .all()
+        )
+        has_newer = before is not None
+        has_older = len(rows) > per_page
+        rows = rows[:per_page]
+
+    return KeysetPage(
+        items=rows,
+        newer=encode_cursor(rows[0]) if rows and has_newer else None,
+        older=encode_cursor(rows[-1]) if rows and has_older else None,
+    )
@@ -0,0 +1,149 @@
+import hashlib
+import io
+import os
+import re
+
+from flask import current_app, url_for
+
+from models import Item
+
+# Uploads are named by a hash of their contents, e.g. 3f2a...9c.png
+HASHED_NAME = re.compile(r"^[0-9a-f]{32}\.(png|jpe?g)$")
+
+
+def _upload_path(filename):
+    return os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
+
+
+def variant_name(filename, variant):
+    """
+    Name of a generated copy of an uploaded image.
+    - "webp": full size WebP
+    - "thumb": store-card thumbnail in the original format
+    - "thumb_webp": store-card thumbnail as WebP
+    """
+    base, ext = os.path.splitext(filename)
+    return {
+        "webp": f"{base}.webp",
+        "thumb": f"{base}-thumb{ext}",
+        "thumb_webp": f"{base}-thumb.webp",
+    }[variant]
+
+
+def generate_variants(filename):
+    """Create any missing thumbnail and WebP copies of an uploaded image."""
+    wanted = {
+        variant: _upload_path(variant_name(filename, variant))
+        for variant in ("webp", "thumb", "thumb_webp")
+    }
+    missing = {
+        variant: path for variant, path in wanted.items() if not os.path.exists(path)
+    }
+    if not missing:
+        return
+
+    # Pillow is only needed when images change, so pages don't pay to load it
+    from PIL import Image, ImageOps
+
+    with Image.open(_upload_path(filename)) as original:
+        image = ImageOps.exif_transpose(original)
+        thumb = image.copy()
+        thumb.thumbnail(current_app.config["IMAGE_THUMBNAIL_SIZE"])
+        quality = current_app.config["IMAGE_QUALITY"]
+
+        for variant, path in missing.items():
+            source = thumb if variant.startswith("thumb") else image
+            if path.endswith(".webp"):
+                source.save(path, "WEBP", quality=quality, method=6)
+            elif path.endswith(".png"):
+                source.save(path, "PNG", optimize=True)
+            else:
+                source.convert("RGB").save(path, "JPEG", quality=quality, optimize=True)
+
+
+def save_image(data, original_name):
+    """
+    Store uploaded image bytes under a content-hash name and build its variants.
+    Identical uploads share one set of files. Raises ValueError if the data
+    isn't an image Pillow can read.
+    """
+    ext = os.path.splitext(original_name)[1].lower()
+    if ext == ".jpeg":
+        ext = ".jpg"
+    filename = f"{hashlib.sha256(data).hexdigest()[:32]}{ext}"
+    path = _upload_path(filename)
+
+    if not os.path.exists(path):
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.verify()
+        except (UnidentifiedImageError, OSError) as error:
+            raise ValueError("Uploaded file is not a valid image.") from error
+        with open(path, "wb") as f:
+            f.write(data)
+
+    generate_variants(filename)
+    return filename
+
+
+def remove_image(filename):
+    """
+    Delete an uploaded image and its variants, unless an item still uses it.
+    Call after the change that stopped using it has been committed.
+    """
+    if not filename or Item.query.filter_by(image_filename=filename).first():
+        return
+
+    names = [filename]
+    if HASHED_NAME.match(filename):
+        names += [variant_name(filename, v) for v in ("webp", "thumb", "thumb_webp")]
+    for name in names:
+        path = _upload_path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def has_variants(filename):
+    """Whether an image went through the upload pipeline and has variants."""
+    return bool(filename and HASHED_NAME.match(filename))
+
+
+def image_url(filename, variant=None):
+    """
+    URL for an item image, or one of its variants. Only content-hashed uploads
+    have variants (older ones need `flask backfill-images`), and only they are
+    served as immutable; anything else falls back to the plain static file.
+    """
+    if not filename:
+        return url_for("static", filename="uploads/default.png")
+    if not has_variants(filename):
+        return url_for("static", filename="uploads/" + filename)
+    if variant:
+        filename = variant_name(filename, variant)
+    return url_for("items.media", filename=filename)
+
+
+def backfill_images():
+    """
+    Move every item image that isn't content-hashed yet through the upload
+    pipeline, and create any variants missing for the ones that are.
+    Returns the old filenames that were replaced; the caller commits and
+    then removes them with remove_image.
+    """
+    new_names = {}
+    for item in Item.query.filter(Item.image_filename.isnot(None)):
+        filename = item.image_filename
+        if HASHED_NAME.match(filename):
+            generate_variants(filename)
+            continue
+        if filename not in new_names:
+            path = _upload_path(filename)
+            if not os.path.exists(path):
+                current_app.logger.warning("Image %s is missing; skipped", filename)
+                continue
+            with open(path, "rb") as f:
+                new_names[filename] = save_image(f.read(), filename)
+        item.image_filename = new_names[filename]
+    return list(new_names)
@@ -0,0 +1,276 @@
+from collections import namedtuple
+from datetime import datetime
+import math
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db, Order, OrderLine, OrderStatus
+
+# Orders the kitchen is working through, oldest confirmation first
+QUEUED_STATUSES = (OrderStatus.CONFIRMED.value, OrderStatus.PREPARING.value)
+
+# An order's place in the kitchen queue (1 is next) and the minutes until
+# it should be ready
+WaitEstimate = namedtuple("WaitEstimate", ["position", "minutes"])
+
+# A queued order. lines is a tuple of (item ID, quantity), work its
+# estimated prep time in seconds when it joined, and preparing_since when it
+# moved to Being Prepared (None until then).
+QueueEntry = namedtuple(
+    "QueueEntry", ["slot", "user_id", "lines", "work", "preparing_since"]
+)
+
+
+class FenwickTree:
+    """Running totals over numbered slots, updated and summed in O(log n)."""
+
+    def __init__(self, size):
+        self.size = size
+        self._tree = [0.0] * (size + 1)
+
+    def add(self, slot, value):
+        index = slot + 1
+        while index <= self.size:
+            self._tree[index] += value
+            index += index & -index
+
+    def prefix(self, slot):
+        """The total of every slot before `slot`."""
+        total = 0.0
+        index = slot
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+
+class KitchenScheduler:
+    """
+    In-process queue of the Confirmed and Being Prepared orders, with an
+    estimated wait for each, for the order pages.
+    - Orders queue in the order they were confirmed. Each holds a slot in
+      that order, and Fenwick trees over the slots count the orders and add
+      up the prep time ahead of any one of them in O(log n).
+    - An order's prep time is the sum of its lines' per-unit estimates. Each
+      item's estimate is an exponentially weighted average of how long its
+      orders really took from Being Prepared to Ready For Pickup, starting
+      from KITCHEN_DEFAULT_PREP_SECONDS.
+    - KITCHEN_STATIONS orders are prepared at once, so the work ahead is
+      shared between them. Orders ahead count in full, so estimates err on
+      the long side.
+    - Kept up to date by the code paths that change order statuses, and
+      rebuilt from the Order table on first use and every
+      KITCHEN_REBUILD_INTERVAL seconds, which also picks up orders changed by
+      other processes. The first build replays the prep times of the last
+      KITCHEN_HISTORY_ORDERS orders into the estimates.
+    """
+
+    def __init__(self):
+        self._entries = None  # order ID: QueueEntry
+        self._by_user = {}  # user ID: set of queued order IDs
+        self._work = None  # FenwickTree of prep seconds per slot
+        self._counts = None  # FenwickTree of orders per slot
+        self._next_slot = 0
+        self._prep_seconds = None  # item ID: estimated seconds per unit
+        self._rebuilt_at = 0.0
+        self._lock = threading.Lock()
+
+    def _order_lines(self, order_ids):
+        """{order ID: ((item ID, quantity), ...)} for the given orders."""
+        lines = {}
+        rows = db.session.execute(
+            select(OrderLine.order_id, OrderLine.item_id, OrderLine.quantity).where(
+                OrderLine.order_id.in_(order_ids)
+            )
+        )
+        for order_id, item_id, quantity in rows:
+            lines[order_id] = lines.get(order_id, ()) + ((item_id, quantity),)
+        return lines
+
+    def _history(self):
+        """(lines, prep seconds) of the latest finished orders, oldest first."""
+        rows = db.session.execute(
+            select(Order.id, Order.preparing_at, Order.ready_at)
+            .where(Order.preparing_at.is_not(None), Order.ready_at.is_not(None))
+            .order_by(Order.id.desc())
+            .limit(current_app.config["KITCHEN_HISTORY_ORDERS"])
+        ).all()
+        lines = self._order_lines([row.id for row in rows])
+        return [
+            (lines.get(row.id, ()), (row.ready_at - row.preparing_at).total_seconds())
+            for row in reversed(rows)
+        ]
+
+    def rebuild(self):
+        """Reload the queue, and the first time the estimates, from the table."""
+        history = self._history() if self._prep_seconds is None else None
+        priority = func.coalesce(
+            Order.confirmed_at, Order.preparing_at, Order.timestamp
+        )
+        rows = db.session.execute(
+            select(Order.id, Order.user_id, Order.status, Order.preparing_at)
+            .where(Order.status.in_(QUEUED_STATUSES))
+            .order_by(priority, Order.id)
+        ).all()
+        lines = self._order_lines([row.id for row in rows])
+
+        with self._lock:
+            if history is not None:
+                self._prep_seconds = {}
+                for order_lines, seconds in history:
+                    self._learn(order_lines, seconds)
+            self._reset(len(rows))
+            for row in rows:
+                preparing = row.status == OrderStatus.PREPARING.value
+                self._enqueue(
+                    row.id,
+                    row.user_id,
+                    lines.get(row.id, ()),
+                    (row.preparing_at or datetime.utcnow()) if preparing else None,
+                )
+            self._rebuilt_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        interval = current_app.config["KITCHEN_REBUILD_INTERVAL"]
+        if self._entries is None or time.monotonic() - self._rebuilt_at >= interval:
+            self.rebuild()
+
+    def _reset(self, size):
+        self._entries = {}
+        self._by_user = {}
+        self._work = FenwickTree(max(64, 2 * size))
+        self._counts = FenwickTree(self._work.size)
+        self._next_slot = 0
+
+    def _compact(self):
+        """Renumber the queued orders from slot 0 once the slots run out."""
+        entries = sorted(self._entries.items(), key=lambda pair: pair[1].slot)
+        self._reset(len(entries))
+        for order_id, entry in entries:
+            self._enqueue(order_id, entry.user_id, entry.lines, entry.preparing_since)
+
+    def _estimate_work(self, lines):
+        default = current_app.config["KITCHEN_DEFAULT_PREP_SECONDS"]
+        return sum(
+            quantity * self._prep_seconds.get(item_id, default)
+            for item_id, quantity in lines
+        )
+
+    def _learn(self, lines, seconds):
+        """
+        Fold an order's real prep time into its items' estimates. The time
+        is split between the lines in proportion to their current estimates.
+        """
+        estimated = self._estimate_work(lines)
+        if not lines or estimated <= 0 or seconds < 0:
+            return
+        alpha = current_app.config["KITCHEN_EWMA_ALPHA"]
+        default = current_app.config["KITCHEN_DEFAULT_PREP_SECONDS"]
+        for item_id, quantity in lines:
+            current = self._prep_seconds.get(item_id, default)
+            observed = seconds * current / estimated  # Per unit, scaled
+            self._prep_seconds[item_id] = current + alpha * (observed - current)
+
+    def _enqueue(self, order_id, user_id, lines, preparing_since):
+        if self._next_slot == self._work.size:
+            self._compact()
+        entry = QueueEntry(
+            self._next_slot, user_id, lines, self._estimate_work(lines), preparing_since
+        )
+        self._next_slot += 1
+        self._entries[order_id] = entry
+        self._by_user.setdefault(user_id, set()).add(order_id)
+        self._work.add(entry.slot, entry.work)
+        self._counts.add(entry.slot, 1)
+
+    def _dequeue(self, order_id):
+        entry = self._entries.pop(order_id)
+        self._work.add(entry.slot, -entry.work)
+        self._counts.add(entry.slot, -1)
+        user_orders = self._by_user[entry.user_id]
+        user_orders.discard(order_id)
+        if not user_orders:
+            del self._by_user[entry.user_id]
+
+    def record(self, order_id, user_id, new_status):
+        """Move one order after its status change has been committed."""
+        self._apply([(order_id, user_id, new_status)])
+
+    def record_changes(self, changes):
+        """Move the orders of committed bulk changes (helpers.OrderChange)."""
+        self._apply(
+            [(change.order_id, change.user_id, change.new_status) for change in changes]
+        )
+
+    def _apply(self, changes):
+        """
+        Queue, update or drop orders for a list of (order ID, user ID, new
+        status). Orders joining the queue have their lines loaded in one query.
+        """
+        if self._entries is None:
+            return  # Not built yet; the first read will load the table
+        joining = [
+            order_id
+            for order_id, _, new_status in changes
+            if new_status in QUEUED_STATUSES and order_id not in self._entries
+        ]
+        lines = self._order_lines(joining) if joining else {}
+        now = datetime.utcnow()
+
+        with self._lock:
+            for order_id, user_id, new_status in changes:
+                entry = self._entries.get(order_id)
+                if new_status not in QUEUED_STATUSES:
+                    if entry is None:
+                        continue
+                    if (
+                        new_status == OrderStatus.READY.value
+                        and entry.preparing_since is not None
+                    ):
+                        seconds = (now - entry.preparing_since).total_seconds()
+                        self._learn(entry.lines, seconds)
+                    self._dequeue(order_id)
+                elif entry is None:
+                    preparing = new_status == OrderStatus.PREPARING.value
+                    self._enqueue(
+                        order_id,
+                        user_id,
+                        lines.get(order_id, ()),
+                        now if preparing else None,
+                    )
+                elif new_status == OrderStatus.PREPARING.value:
+                    self._entries[order_id] = entry._replace(preparing_since=now)
+
+    def _wait(self, entry, now):
+        stations = current_app.config["KITCHEN_STATIONS"]
+        seconds = self._work.prefix(entry.slot) / stations + entry.work
+        if entry.preparing_since is not None:
+            seconds -= (now - entry.preparing_since).total_seconds()
+        return WaitEstimate(
+            int(self._counts.prefix(entry.slot)) + 1,
+            max(1, math.ceil(seconds / 60)),
+        )
+
+    def estimates(self, order_ids):
+        """{order ID: WaitEstimate} for those of the orders that are queued."""
+        self._ensure_fresh()
+        now = datetime.utcnow()
+        with self._lock:
+            return {
+                order_id: self._wait(self._entries[order_id], now)
+                for order_id in order_ids
+                if order_id in self._entries
+            }
+
+    def estimates_for_user(self, user_id):
+        """{order ID: WaitEstimate} for a student's queued orders."""
+        self._ensure_fresh()
+        with self._lock:
+            order_ids = list(self._by_user.get(user_id, ()))
+        return self.estimates(order_ids)
+
+
+kitchen = KitchenScheduler()
@@ -0,0 +1,400 @@
+"""
+Load test the main pages and report latency percentiles and throughput.
+
+Runs against the app in-process through the Flask test client, or against a
+running server with --url. Each route is driven in its own phase by
+--concurrency parallel clients, each logged in as its own account.
+
+    python loadtest.py                                  # in-process
+    python loadtest.py --url http://127.0.0.1:5000      # local server
+    python loadtest.py --requests 500 --concurrency 8 --json results.json
+    python loadtest.py --startup 10                     # cold start only
+    python loadtest.py --login-storm 200 --concurrency 20
+
+--startup times a fresh interpreter importing the app, building it with
+create_app() and serving its first request, so cold start can be watched as
+the app grows.
+
+--login-storm N sends N logins through /login at the same moment while
+--concurrency students keep browsing /store, and reports login latency, how
+many logins the password hashing pool turned away (HashPoolBusy) and how
+/store held up, so PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE and
+PASSWORD_HASH_METHOD can be checked against each other.
+
+The default accounts come from `flask generate-data`; pass --student and
+--staff to use others (e.g. lisa@school.com and homer@school.com after seeding).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+import argparse
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROUTES = ["/store", "/order/<id>", "/orders", "/my-orders"]
+STAFF_ROUTES = {"/orders"}
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+# Run in a fresh interpreter by --startup; prints its timings as JSON
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+status = app.test_client().get("/login").status_code
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (served - created) * 1000,
+    "total_ms": (served - started) * 1000,
+    "status": status,
+}))
+"""
+
+
+def _open_login_form(session):
+    """Load the login form, keeping its CSRF token for the POST."""
+    page = session.fetch("/login")
+    match = CSRF_TOKEN.search(page)
+    session.csrf_token = match.group(1) if match else ""
+
+
+def _log_in(session, email, password):
+    """Log a session in through the real login form, CSRF token included."""
+    _open_login_form(session)
+    if session.post("/login", {"email": email, "password": password}) != 302:
+        raise SystemExit(f"Could not log in as {email}")
+
+
+class TestClientSession:
+    """A user of the in-process app, logged in unless no email is given."""
+
+    def __init__(self, app, email=None, password=None):
+        self.client = app.test_client()
+        self.location = ""  # Where the last POST redirected to
+        if email:
+            _log_in(self, email, password)
+
+    def fetch(self, path):
+        return self.client.get(path).get_data(as_text=True)
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        data = {"csrf_token": self.csrf_token, **data}
+        response = self.client.post(path, data=data)
+        self.location = response.headers.get("Location", "")
+        return response.status_code
+
+
+class HttpSession:
+    """
+    A user of a running server with its own cookie jar, logged in unless no
+    email is given.
+    """
+
+    def __init__(self, base_url, email=None, password=None):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+        self.location = ""  # Where the last POST redirected to
+        if email:
+            _log_in(self, email, password)
+
+    def fetch(self, path):
+        with self.opener.open(self.base_url + path) as response:
+            return response.read().decode()
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                self.location = ""
+                return response.status
+        except urllib.error.HTTPError as error:
+            self.location = error.headers.get("Location", "")
+            return error.code
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        body = urllib.parse.urlencode({"csrf_token": self.csrf_token, **data}).encode()
+        return self._open(urllib.request.Request(self.base_url + path, data=body))
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # Report the 302 itself, like the test client does
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(
+        0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def run_phase(sessions, route, requests, item_ids, order_posts, seed=1):
+    """Send `requests` requests for one route, spread over the sessions."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    per_session = [requests // len(sessions)] * len(sessions)
+    for index in range(requests % len(sessions)):
+        per_session[index] += 1
+
+    def worker(session, count, seed):
+        nonlocal errors
+        rng = random.Random(seed)  # Same item choices on every run
+        for _ in range(count):
+            if route == "/order/<id>":
+                path = f"/order/{rng.choice(item_ids)}"
+                post = rng.random() < order_posts
+            else:
+                path, post = route, False
+            started = time.perf_counter()
+            if post:
+                status = session.post(path, {"quantity": 1})
+            else:
+                status = session.get(path)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400 or (status == 302 and not post):
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+        futures = [
+            pool.submit(worker, session, count, seed * 1000 + index)
+            for index, (session, count) in enumerate(zip(sessions, per_session))
+        ]
+    wall = time.perf_counter() - started
+    for future in futures:
+        future.result()  # Re-raise anything that went wrong in a worker
+
+    return _summary(route, latencies, wall, errors)
+
+
+def _summary(route, latencies, wall, errors):
+    latencies.sort()
+    return {
+        "route": route,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "rps": len(latencies) / wall if wall else 0.0,
+    }
+
+
+def run_login_storm(logins, browsers, browse_route="/store"):
+    """
+    Post every session in `logins` to /login at the same moment, each with
+    its (email, password), while the `browsers` keep requesting
+    browse_route until the last login is answered.
+    - A login redirected to the dashboard went through; one redirected back
+      to /login was turned away because the hashing pool was full
+      (HashPoolBusy); anything else counts as an error.
+    Returns the /login and browse_route results.
+    """
+    start = threading.Barrier(len(logins) + 1)
+    done = threading.Event()
+    lock = threading.Lock()
+    login_latencies, browse_latencies = [], []
+    counts = {"rejected": 0, "errors": 0, "browse_errors": 0}
+
+    def log_in(session, email, password):
+        _open_login_form(session)  # Not timed; the storm is the POSTs
+        start.wait()
+        started = time.perf_counter()
+        status = session.post("/login", {"email": email, "password": password})
+        elapsed = time.perf_counter() - started
+        with lock:
+            login_latencies.append(elapsed)
+            if status != 302 or session.location.endswith("/login"):
+                counts["rejected" if status == 302 else "errors"] += 1
+
+    def browse(session):
+        while not done.is_set():
+            started = time.perf_counter()
+            status = session.get(browse_route)
+            elapsed = time.perf_counter() - started
+            with lock:
+                browse_latencies.append(elapsed)
+                if status != 200:
+                    counts["browse_errors"] += 1
+
+    with ThreadPoolExecutor(max_workers=len(logins) + len(browsers)) as pool:
+        browsing = [pool.submit(browse, session) for session in browsers]
+        storm = [pool.submit(log_in, *login) for login in logins]
+        start.wait()
+        started = time.perf_counter()
+        for future in storm:
+            future.result()
+        wall = time.perf_counter() - started
+        done.set()
+        for future in browsing:
+            future.result()
+
+    login = _summary("/login", login_latencies, wall, counts["errors"])
+    login["rejected"] = counts["rejected"]
+    browse = _summary(
+        f"{browse_route} (storm)", browse_latencies, wall, counts["browse_errors"]
+    )
+    return [login, browse]
+
+
+def measure_startup(runs):
+    """Median cold start timings over `runs` fresh interpreters."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    if any(sample["status"] != 200 for sample in samples):
+        raise SystemExit("The first request failed")
+    return {
+        key: percentile(sorted(sample[key] for sample in samples), 0.50)
+        for key in ("import_ms", "create_app_ms", "first_request_ms", "total_ms")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="Base URL of a running server.")
+    parser.add_argument("--requests", type=int, default=200, help="Per route.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES)
+    parser.add_argument(
+        "--student", default="student{n}@school.com", help="{n} is 1, 2, ..."
+    )
+    parser.add_argument("--staff", default="staff{n}@school.com")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--staff-password", help="Defaults to --password.")
+    parser.add_argument(
+        "--items", default="1-200", help="Item IDs for /order/<id>, e.g. 1-200."
+    )
+    parser.add_argument(
+        "--order-posts",
+        type=float,
+        default=0.0,
+        help="Share of /order/<id> requests that place an order (0-1).",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    parser.add_argument(
+        "--startup",
+        type=int,
+        metavar="RUNS",
+        help="Only time cold starts, over this many fresh interpreters.",
+    )
+    parser.add_argument(
+        "--login-storm",
+        type=int,
+        metavar="LOGINS",
+        help="Only send this many simultaneous logins, as the students after "
+        "the --concurrency ones browsing /store.",
+    )
+    args = parser.parse_args()
+
+    if args.startup:
+        result = measure_startup(args.startup)
+        for key, value in result.items():
+            print(f"{key:<20}{value:>9.1f}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(result, f, indent=2)
+        return
+
+    first, _, last = args.items.partition("-")
+    item_ids = list(range(int(first), int(last or first) + 1))
+
+    if args.url:
+
+        def login(email=None, password=None):
+            return HttpSession(args.url, email, password)
+
+    else:
+        from app import create_app
+
+        app = create_app()
+
+        def login(email=None, password=None):
+            return TestClientSession(app, email, password)
+
+    def sessions(pattern, password):
+        return [
+            login(pattern.format(n=n), password) for n in range(1, args.concurrency + 1)
+        ]
+
+    students = sessions(args.student, args.password)
+    staff = None
+    results = []
+    if args.login_storm:
+        accounts = [
+            (login(), args.student.format(n=n), args.password)
+            for n in range(
+                args.concurrency + 1, args.concurrency + args.login_storm + 1
+            )
+        ]
+        results = run_login_storm(accounts, students)
+        args.routes = []
+    for route in args.routes:
+        if route in STAFF_ROUTES:
+            staff = staff or sessions(args.staff, args.staff_password or args.password)
+        results.append(
+            run_phase(
+                staff if route in STAFF_ROUTES else students,
+                route,
+                args.requests,
+                item_ids,
+                args.order_posts,
+                args.seed,
+            )
+        )
+
+    print(
+        f"{'Route':<14}{'Requests':>9}{'Errors':>8}{'p50 ms':>9}"
+        f"{'p95 ms':>9}{'p99 ms':>9}{'Max ms':>9}{'Req/s':>9}"
+    )
+    for result in results:
+        print(
+            f"{result['route']:<14}{result['requests']:>9}{result['errors']:>8}"
+            f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+            f"{result['max_ms']:>9.1f}{result['rps']:>9.1f}"
+        )
+        if "rejected" in result:
+            print(
+                f"{'':<14}{result['rejected']} of {result['requests']} logins "
+                "turned away by the hashing pool (HashPoolBusy)"
+            )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
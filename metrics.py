@@ -0,0 +1,249 @@
+from bisect import bisect_left
+import threading
+import time
+
+from flask import (
+    g,
+    has_request_context,
+    request,
+    before_render_template,
+    template_rendered,
+)
+from sqlalchemy import event
+
+from models import db
+
+# Upper bounds of the histogram buckets. Every histogram has a fixed number
+# of buckets, so memory stays flat however many requests are recorded.
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Statements kept per request for the slow request log
+MAX_STATEMENTS_KEPT = 100
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their sum (Prometheus style)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request timings, SQL statement counts and times, and
+    template render times, for the /metrics endpoint.
+    - Each request's statements are counted and timed with SQLAlchemy
+      cursor events on db's engine, and its templates with Flask's
+      rendering signals. Everything is added up in flask.g and recorded once
+      the response is ready.
+    - Figures go into fixed-bucket histograms, one per endpoint or template.
+    - Requests slower than METRICS_SLOW_REQUEST_MS are logged as warnings
+      with the statements they ran.
+    - Setting METRICS_ENABLED to False skips all of it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}  # endpoint: Histogram of seconds
+        self._statements = {}  # endpoint: Histogram of statement counts
+        self._sql_time = {}  # endpoint: Histogram of seconds spent in SQL
+        self._templates = {}  # template name: Histogram of seconds
+        self._responses = {}  # (endpoint, status code): count
+        self._slow = {}  # endpoint: count
+        self._caches = {}  # cache name: its stats function
+        self._pools = {}  # worker pool name: its stats function
+
+    def init_app(self, app):
+        if not app.config["METRICS_ENABLED"]:
+            return
+        self._slow_seconds = app.config["METRICS_SLOW_REQUEST_MS"] / 1000
+        self._logger = app.logger
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_template, app)
+        template_rendered.connect(self._finish_template, app)
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._start_statement)
+            event.listen(db.engine, "after_cursor_execute", self._finish_statement)
+
+    def add_cache(self, name, stats):
+        """
+        Include a cache's figures (hits, misses, hit ratio, ...) in /metrics.
+        stats is called on every scrape and returns a dict of numbers.
+        """
+        self._caches[name] = stats
+
+    def add_pool(self, name, stats):
+        """
+        Include a worker pool's figures (workers, in flight, queue depth, ...)
+        in /metrics, the same way as add_cache.
+        """
+        self._pools[name] = stats
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = []
+        g.metrics_statement_count = 0
+        g.metrics_sql_seconds = 0.0
+
+    def _start_statement(self, conn, cursor, statement, parameters, context, many):
+        if has_request_context():
+            conn.info["metrics_started"] = time.perf_counter()
+
+    def _finish_statement(self, conn, cursor, statement, parameters, context, many):
+        started = conn.info.pop("metrics_started", None)
+        if started is None or "metrics_statements" not in g:
+            return
+        seconds = time.perf_counter() - started
+        g.metrics_statement_count += 1
+        g.metrics_sql_seconds += seconds
+        if len(g.metrics_statements) < MAX_STATEMENTS_KEPT:
+            g.metrics_statements.append((seconds, statement))
+
+    def _start_template(self, app, template, context):
+        if has_request_context():
+            g.setdefault("metrics_templates", []).append(time.perf_counter())
+
+    def _finish_template(self, app, template, context):
+        if not g.get("metrics_templates"):
+            return
+        seconds = time.perf_counter() - g.metrics_templates.pop()
+        name = template.name or "(string)"
+        self._observe(self._templates, name, seconds, SECONDS_BUCKETS)
+
+    def _observe(self, histograms, key, value, buckets):
+        with self._lock:
+            if key not in histograms:
+                histograms[key] = Histogram(buckets)
+            histograms[key].observe(value)
+
+    def _finish_request(self, response):
+        if "metrics_started" not in g:
+            return response
+        seconds = time.perf_counter() - g.metrics_started
+        endpoint = request.endpoint or "unmatched"
+        count = g.metrics_statement_count
+
+        self._observe(self._requests, endpoint, seconds, SECONDS_BUCKETS)
+        self._observe(self._statements, endpoint, count, STATEMENT_BUCKETS)
+        self._observe(self._sql_time, endpoint, g.metrics_sql_seconds, SECONDS_BUCKETS)
+        with self._lock:
+            key = (endpoint, response.status_code)
+            self._responses[key] = self._responses.get(key, 0) + 1
+            if seconds >= self._slow_seconds:
+                self._slow[endpoint] = self._slow.get(endpoint, 0) + 1
+
+        if seconds >= self._slow_seconds:
+            statements = "\n".join(
+                f"  {statement_seconds * 1000:8.1f} ms  {' '.join(statement.split())}"
+                for statement_seconds, statement in g.metrics_statements
+            )
+            self._logger.warning(
+                "Slow request: %s %s (%s) took %.0f ms, %d SQL statement(s) "
+                "in %.0f ms\n%s",
+                request.method,
+                request.full_path.rstrip("?"),
+                endpoint,
+                seconds * 1000,
+                count,
+                g.metrics_sql_seconds * 1000,
+                statements,
+            )
+        return response
+
+    def render(self):
+        """All the figures in the Prometheus text exposition format."""
+        families = [
+            (
+                "canteen_request_duration_seconds",
+                "Time to build each response, by endpoint.",
+                self._requests,
+                "endpoint",
+            ),
+            (
+                "canteen_request_sql_statements",
+                "SQL statements run per request, by endpoint.",
+                self._statements,
+                "endpoint",
+            ),
+            (
+                "canteen_request_sql_duration_seconds",
+                "Time spent running SQL per request, by endpoint.",
+                self._sql_time,
+                "endpoint",
+            ),
+            (
+                "canteen_template_render_duration_seconds",
+                "Time to render each template.",
+                self._templates,
+                "template",
+            ),
+        ]
+        lines = []
+        with self._lock:
+            for name, help_text, histograms, label in families:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, histogram in sorted(histograms.items()):
+                    lines += histogram.lines(name, f'{label}="{_escape(key)}"')
+
+            lines += [
+                "# HELP canteen_responses_total Responses sent, by endpoint and status.",
+                "# TYPE canteen_responses_total counter",
+            ]
+            for (endpoint, status), count in sorted(self._responses.items()):
+                lines.append(
+                    f'canteen_responses_total{{endpoint="{_escape(endpoint)}",'
+                    f'status="{status}"}} {count}'
+                )
+            lines += [
+                "# HELP canteen_slow_requests_total Requests over the slow threshold.",
+                "# TYPE canteen_slow_requests_total counter",
+            ]
+            for endpoint, count in sorted(self._slow.items()):
+                lines.append(
+                    f'canteen_slow_requests_total{{endpoint="{_escape(endpoint)}"}} '
+                    f"{count}"
+                )
+        lines += self._gauge_lines("cache", self._caches)
+        lines += self._gauge_lines("pool", self._pools)
+        return "\n".join(lines) + "\n"
+
+    def _gauge_lines(self, kind, sources):
+        """
+        One gauge per figure of the registered caches or pools, labelled by
+        their name, e.g. canteen_cache_hits{cache="catalogue"}.
+        """
+        figures = {}
+        for name, stats in sorted(sources.items()):
+            for figure, value in stats().items():
+                figures.setdefault(figure, []).append((name, value))
+        lines = []
+        for figure, values in sorted(figures.items()):
+            lines.append(f"# TYPE canteen_{kind}_{figure} gauge")
+            lines += [
+                f'canteen_{kind}_{figure}{{{kind}="{_escape(name)}"}} {value}'
+                for name, value in values
+            ]
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_metrics = RequestMetrics()
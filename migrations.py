@@ -0,0 +1,79 @@
+from sqlalchemy import inspect, text
+
+from models import db
+
+
+def _upgrade_single_item_orders(conn):
+    """
+    Orders used to hold one item_id and quantity directly. Move those into
+    order lines, rebuilding the order table without the old columns.
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("order")}
+    if "item_id" not in columns:
+        return False
+
+    conn.execute(text('ALTER TABLE "order" RENAME TO order_legacy'))
+    db.metadata.create_all(conn)  # Recreates "order" (and order_line if missing)
+    conn.execute(
+        text(
+            'INSERT INTO "order" (id, user_id, total_cost, timestamp, status) '
+            "SELECT id, user_id, total_cost, timestamp, status FROM order_legacy"
+        )
+    )
+    conn.execute(
+        text(
+            "INSERT INTO order_line (order_id, item_id, quantity, unit_price) "
+            "SELECT id, item_id, quantity, total_cost / quantity FROM order_legacy"
+        )
+    )
+    conn.execute(text("DROP TABLE order_legacy"))
+    return True
+
+
+def _add_missing_columns(conn):
+    """
+    Add columns that models.py has gained since a table was created. Only
+    nullable columns can be added this way, which is all later ones are.
+    """
+    added = []
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(
+                    text(
+                        f'ALTER TABLE "{table.name}" '
+                        f'ADD COLUMN "{column.name}" {column_type}'
+                    )
+                )
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def upgrade_db():
+    """
+    Bring an existing database up to date with models.py without resetting it.
+    - Creates any missing tables.
+    - Converts single-item orders from older versions into order lines.
+    - Adds any missing (nullable) columns to existing tables.
+    - Creates any missing indexes on existing tables.
+    Safe to run on every launch; each step is skipped once applied.
+    Returns the names of the indexes that were created.
+    """
+    created = []
+    with db.engine.begin() as conn:
+        if inspect(conn).has_table("order"):
+            _upgrade_single_item_orders(conn)
+        db.metadata.create_all(conn)
+        _add_missing_columns(conn)
+
+        inspector = inspect(conn)
+        for table in db.metadata.sorted_tables:
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+    return created
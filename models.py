@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password, needs_rehash
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
@@ -15,6 +16,25 @@ class OrderStatus(Enum):
     CANCELLED = "Cancelled"
 
 
+# Orders the kitchen still has to deal with, and orders that are finished
+ACTIVE_STATUSES = (
+    OrderStatus.AWAITING.value,
+    OrderStatus.CONFIRMED.value,
+    OrderStatus.PREPARING.value,
+    OrderStatus.READY.value,
+)
+CLOSED_STATUSES = (OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value)
+
+# Order column recording when an order reached each status after being placed
+STATUS_TIMESTAMPS = {
+    OrderStatus.CONFIRMED.value: "confirmed_at",
+    OrderStatus.PREPARING.value: "preparing_at",
+    OrderStatus.READY.value: "ready_at",
+    OrderStatus.COMPLETED.value: "completed_at",
+    OrderStatus.CANCELLED.value: "cancelled_at",
+}
+
+
 db = SQLAlchemy()
 
 
@@ -27,11 +47,15 @@ class User(UserMixin, db.Model):
 
     orders = db.relationship("Order", backref="user", lazy=True)
 
+    # Hashing runs on the bounded pool in passwords.py, not the request thread
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     def add_credit(self, amount):
         if amount > 0:
@@ -55,25 +79,213 @@ class Item(db.Model):
     is_vegetarian = db.Column(db.Boolean, default=False)
     image_filename = db.Column(db.String(255), nullable=True)
 
-    orders = db.relationship("Order", backref="item", lazy=True)
+    order_lines = db.relationship("OrderLine", backref="item", lazy=True)
 
     def __repr__(self):
         return f"<Item {self.name}, Qty: {self.quantity}, Veg: {self.is_vegetarian}>"
 
 
 class Order(db.Model):
+    # Composite indexes for the order listings: staff filter by status and
+    # students by user, both newest first
+    __table_args__ = (
+        db.Index("ix_order_status_timestamp", "status", "timestamp"),
+        db.Index("ix_order_user_timestamp", "user_id", "timestamp"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    item_id = db.Column(db.Integer, db.ForeignKey("item.id"), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
     total_cost = db.Column(db.Numeric(10, 2), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(
         db.String(50), default=OrderStatus.AWAITING.value, nullable=False
     )
+    # When the order reached each later status (see STATUS_TIMESTAMPS); None
+    # for orders that haven't, or that changed before these were recorded
+    confirmed_at = db.Column(db.DateTime, nullable=True)
+    preparing_at = db.Column(db.DateTime, nullable=True)
+    ready_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    cancelled_at = db.Column(db.DateTime, nullable=True)
+    # The pickup slot the student booked; None means as soon as possible
+    pickup_slot_id = db.Column(
+        db.Integer, db.ForeignKey("pickup_slot.id"), nullable=True, index=True
+    )
 
-    def set_status(self, new_status: OrderStatus):
+    lines = db.relationship(
+        "OrderLine", backref="order", lazy=True, cascade="all, delete-orphan"
+    )
+    pickup_slot = db.relationship("PickupSlot", lazy=True)
+
+    @property
+    def total_quantity(self):
+        return sum(line.quantity for line in self.lines)
+
+    @property
+    def status_since(self):
+        """When the order reached its current status, if known."""
+        column = STATUS_TIMESTAMPS.get(self.status)
+        return getattr(self, column) if column else self.timestamp
+
+    def set_status(self, new_status: OrderStatus, when=None):
         self.status = new_status.value
+        column = STATUS_TIMESTAMPS.get(new_status.value)
+        if column:
+            setattr(self, column, when or datetime.utcnow())
+
+    def __repr__(self):
+        return f"<Order {self.id}, Lines: {len(self.lines)}, Status: {self.status}>"
+
+
+class OrderLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(
+        db.Integer, db.ForeignKey("order.id"), nullable=False, index=True
+    )
+    item_id = db.Column(
+        db.Integer, db.ForeignKey("item.id"), nullable=False, index=True
+    )
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Numeric(10, 2), nullable=False)
+
+    @property
+    def line_total(self):
+        return self.unit_price * self.quantity
 
     def __repr__(self):
-        return f"<Order {self.id}, Item: {self.item_id}, Status: {self.status}>"
+        return f"<OrderLine {self.id}, Item: {self.item_id}, Qty: {self.quantity}>"
+
+
+class PickupSlot(db.Model):
+    """
+    A window for collecting orders, with room for at most max_orders orders
+    and max_units item units (see slots.py). booked_orders and booked_units
+    are kept up to date in the same transaction as the orders that book or
+    release them, so remaining capacity is read without counting orders.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    starts_at = db.Column(db.DateTime, unique=True, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    max_orders = db.Column(db.Integer, nullable=False)
+    max_units = db.Column(db.Integer, nullable=False)
+    booked_orders = db.Column(db.Integer, nullable=False, default=0)
+    booked_units = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def remaining_orders(self):
+        return max(0, self.max_orders - self.booked_orders)
+
+    @property
+    def remaining_units(self):
+        return max(0, self.max_units - self.booked_units)
+
+    def __repr__(self):
+        return (
+            f"<PickupSlot {self.starts_at}, Orders: {self.booked_orders}"
+            f"/{self.max_orders}, Units: {self.booked_units}/{self.max_units}>"
+        )
+
+
+# Rollups of order activity for the performance dashboard (see rollups.py).
+# They are updated in the same transaction as the orders they summarise, and
+# `flask rebuild-rollups` recomputes them from the order tables. Times are UTC.
+
+
+class ItemSalesDaily(db.Model):
+    """Units sold and revenue per item, by the day orders were placed."""
+
+    day = db.Column(db.Date, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)  # No FK; outlives the item
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cancelled_quantity = db.Column(db.Integer, nullable=False, default=0)
+    refunded = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<ItemSalesDaily {self.day}, Item: {self.item_id}, Qty: {self.quantity}>"
+        )
+
+
+class OrderHourly(db.Model):
+    """Orders placed and their value, by the hour they were placed."""
+
+    hour = db.Column(db.DateTime, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<OrderHourly {self.hour}, Orders: {self.orders}>"
+
+
+class StatusTransitionDaily(db.Model):
+    """How many orders moved between two statuses each day, and how long it took."""
+
+    day = db.Column(db.Date, primary_key=True)
+    from_status = db.Column(db.String(50), primary_key=True)
+    to_status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    max_seconds = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return (
+            f"<StatusTransitionDaily {self.day}, "
+            f"{self.from_status} -> {self.to_status}: {self.count}>"
+        )
+
+
+class AuditEvent(db.Model):
+    """
+    One entry in the append-only audit log (see audit.py). Actor and subject
+    are plain IDs, not foreign keys, so entries outlive deleted users and items.
+    """
+
+    # Audit queries filter by who did it, what it was done to, or when
+    __table_args__ = (
+        db.Index("ix_audit_event_actor_timestamp", "actor_id", "timestamp"),
+        db.Index(
+            "ix_audit_event_subject_timestamp",
+            "subject_type",
+            "subject_id",
+            "timestamp",
+        ),
+        db.Index("ix_audit_event_timestamp", "timestamp"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    action = db.Column(db.String(50), nullable=False)
+    actor_id = db.Column(db.Integer, nullable=True)  # None for CLI commands
+    actor_email = db.Column(db.String(120), nullable=True)
+    subject_type = db.Column(db.String(30), nullable=False)
+    subject_id = db.Column(db.Integer, nullable=True)
+    amount = db.Column(db.Numeric(10, 2), nullable=True)
+    details = db.Column(db.Text, nullable=True)  # JSON
+
+    def __repr__(self):
+        return (
+            f"<AuditEvent {self.id}, {self.action} "
+            f"{self.subject_type} {self.subject_id} by {self.actor_email}>"
+        )
+
+
+def _refuse_audit_change(mapper, connection, target):
+    raise ValueError("Audit events are append-only.")
+
+
+# Guard the log twice: in the ORM, and in SQLite itself for anything else
+event.listen(AuditEvent, "before_update", _refuse_audit_change)
+event.listen(AuditEvent, "before_delete", _refuse_audit_change)
+for _operation in ("UPDATE", "DELETE"):
+    event.listen(
+        AuditEvent.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TRIGGER audit_event_no_{_operation.lower()} "
+            f"BEFORE {_operation} ON audit_event "
+            "BEGIN SELECT RAISE(ABORT, 'audit_event is append-only'); END"
+        ),
+    )
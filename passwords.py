@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import threading
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashPoolBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+class HashPool:
+    """
+    Bounded pool of threads that do all password hashing.
+    - At most PASSWORD_HASH_WORKERS hashes run at once, so a burst of logins
+      can't take every CPU away from the order pages.
+    - At most PASSWORD_HASH_QUEUE_SIZE more may wait; beyond that, callers get
+      HashPoolBusy straight away instead of piling up.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._workers = 0
+        self.rejected = 0
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                config = current_app.config
+                self._workers = config["PASSWORD_HASH_WORKERS"]
+                self._slots = threading.BoundedSemaphore(
+                    self._workers + config["PASSWORD_HASH_QUEUE_SIZE"]
+                )
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="password-hash"
+                )
+
+    def run(self, func, *args):
+        """Run func(*args) on the pool and wait for the result."""
+        if self._executor is None:
+            self._start()
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashPoolBusy()
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def queue_depth(self):
+        """Number of hashes waiting for a free worker."""
+        return max(0, self._in_flight - self._workers)
+
+    def stats(self):
+        return {
+            "workers": self._workers,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth(),
+            "rejected": self.rejected,
+        }
+
+
+hash_pool = HashPool()
+
+
+def hash_password(password):
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    return hash_pool.run(generate_password_hash, password, method)
+
+
+def verify_password(password_hash, password):
+    return hash_pool.run(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=None)
+def _hash_prefix(method):
+    """
+    The method and parameters werkzeug writes at the start of a hash made
+    with `method`, with shorthands filled in (e.g. "scrypt" becomes
+    "scrypt:32768:8:1"). Found by hashing once per method.
+    """
+    return hash_pool.run(generate_password_hash, "", method).split("$", 1)[0]
+
+
+def needs_rehash(password_hash):
+    """Whether a hash was made with different parameters than configured."""
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    return password_hash.split("$", 1)[0] != _hash_prefix(method)
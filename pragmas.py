@@ -0,0 +1,60 @@
+import re
+
+from sqlalchemy import event
+
+from models import db
+
+# Config keys and the PRAGMA each one sets, in the order they are applied
+PRAGMA_SETTINGS = [
+    ("SQLITE_JOURNAL_MODE", "journal_mode"),
+    ("SQLITE_SYNCHRONOUS", "synchronous"),
+    ("SQLITE_BUSY_TIMEOUT", "busy_timeout"),
+    ("SQLITE_CACHE_SIZE", "cache_size"),
+    ("SQLITE_MMAP_SIZE", "mmap_size"),
+    ("SQLITE_TEMP_STORE", "temp_store"),
+]
+# Values go straight into the PRAGMA statements, so only plain words and
+# numbers are allowed
+PRAGMA_VALUE = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+
+def sqlite_pragmas(config):
+    """The (pragma, value) pairs the config asks for, skipping unset ones."""
+    if not config["SQLITE_TUNING_ENABLED"]:
+        return []
+    pragmas = []
+    for key, pragma in PRAGMA_SETTINGS:
+        value = config.get(key)
+        if value in (None, ""):
+            continue
+        if not PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f"Invalid {key} value: {value!r}")
+        pragmas.append((pragma, value))
+    return pragmas
+
+
+def apply_sqlite_profile(app):
+    """
+    Apply the SQLite connection profile from the config to every new
+    connection the app's engine opens.
+    - WAL lets the order pages keep reading while an order is written, and
+      synchronous=NORMAL only syncs at checkpoints, which is still safe in
+      WAL mode.
+    - busy_timeout makes a writer wait for the lock instead of failing
+      straight away with "database is locked".
+    - cache_size, mmap_size and temp_store keep more of the database and
+      temporary sorting in memory.
+    Databases other than SQLite are left alone.
+    """
+    pragmas = sqlite_pragmas(app.config)
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
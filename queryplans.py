@@ -0,0 +1,139 @@
+"""
+Show the query plans and timings of the order hot paths.
+
+Runs the real pages in-process through the Flask test client against the
+configured database, and prints every statement that reads the order tables
+with its EXPLAIN QUERY PLAN and median time. Fill the database with
+`flask generate-data` first, so the plans and timings are those of a full
+term of orders.
+
+    python queryplans.py
+    python queryplans.py --runs 20 --student student2@school.com
+
+The paths covered are the staff orders page (active orders and the newest
+closed orders page), an older closed orders page reached through its keyset
+cursor, a student's my orders page and the order status counter
+reconciliation. A plan line reading "SCAN order" with no index means the
+query reads the whole order table.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+import argparse
+import re
+import time
+
+from sqlalchemy import event
+
+Statement = namedtuple("Statement", ["sql", "plan", "seconds"])
+OLDER_PAGE = re.compile(r'href="(/orders\?before=[^"]+)"')
+# A full read of the order table, as opposed to a search or an index scan
+FULL_ORDER_SCAN = re.compile(r"\bSCAN order\b(?! USING)")
+
+
+@contextmanager
+def capture_plans(engine):
+    """
+    Record every SELECT run on the engine inside the block, as a list of
+    Statement(sql, plan lines, seconds). Just before the statement runs, its
+    plan is read with EXPLAIN QUERY PLAN and it is timed by running it once
+    to completion with the same parameters (the real run only steps to the
+    first row before its rows are fetched).
+    """
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, many):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            return
+        sqlite = cursor.connection
+        plan = sqlite.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        plan = [row[-1] for row in plan.fetchall()]
+        started = time.perf_counter()
+        sqlite.execute(statement, parameters).fetchall()
+        seconds = time.perf_counter() - started
+        statements.append(Statement(statement, plan, seconds))
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+def reads_orders(statement):
+    """Whether a statement reads the order or order_line table."""
+    return re.search(r'FROM "?order(_line)?\b', statement.sql) is not None
+
+
+def hot_paths(app, student, staff, password):
+    """
+    The order hot paths as (name, function) pairs; each function runs its
+    path once through the real code.
+    """
+    from loadtest import TestClientSession
+    from counters import order_counter
+
+    staff_session = TestClientSession(app, staff, password)
+    student_session = TestClientSession(app, student, password)
+    older = OLDER_PAGE.search(staff_session.fetch("/orders"))
+
+    def reconcile():
+        with app.app_context():
+            order_counter.reconcile()
+
+    paths = [("/orders", lambda: staff_session.get("/orders"))]
+    if older:
+        older_page = older.group(1).replace("&amp;", "&")
+        paths.append(("/orders (older page)", lambda: staff_session.get(older_page)))
+    paths += [
+        ("/my-orders", lambda: student_session.get("/my-orders")),
+        ("order counter reconcile", reconcile),
+    ]
+    return paths
+
+
+def profile(engine, run, runs):
+    """Run a path `runs` times; its order statements with their median times."""
+    timings = {}
+    plans = {}
+    for _ in range(runs):
+        with capture_plans(engine) as statements:
+            run()
+        for statement in filter(reads_orders, statements):
+            timings.setdefault(statement.sql, []).append(statement.seconds)
+            plans[statement.sql] = statement.plan
+    return [
+        Statement(sql, plans[sql], sorted(seconds)[len(seconds) // 2])
+        for sql, seconds in timings.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10, help="Per path.")
+    parser.add_argument("--student", default="student1@school.com")
+    parser.add_argument("--staff", default="staff1@school.com")
+    parser.add_argument("--password", default="password123")
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db, Order
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+        print(f"{Order.query.count():,} orders\n")
+
+    for name, run in hot_paths(app, args.student, args.staff, args.password):
+        print(f"== {name}")
+        for statement in profile(engine, run, args.runs):
+            sql = " ".join(statement.sql.split())
+            print(f"{statement.seconds * 1000:>9.2f} ms  {sql[:140]}")
+            for line in statement.plan:
+                flag = "  <-- full table scan" if FULL_ORDER_SCAN.search(line) else ""
+                print(f"{'':>14}{line}{flag}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import case, delete, func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import (
+    db,
+    Item,
+    Order,
+    OrderLine,
+    OrderStatus,
+    ItemSalesDaily,
+    OrderHourly,
+    StatusTransitionDaily,
+)
+
+
+def _upsert(model, keys, rows, add=(), greatest=()):
+    """
+    Insert rows into a rollup table, or add them to the existing row.
+    Columns in `add` are summed and those in `greatest` keep the larger value.
+    Several rows go in as one executemany.
+    """
+    stmt = sqlite_insert(model)
+    changes = {name: getattr(model, name) + stmt.excluded[name] for name in add}
+    changes.update(
+        {name: func.max(getattr(model, name), stmt.excluded[name]) for name in greatest}
+    )
+    db.session.execute(
+        stmt.on_conflict_do_update(index_elements=keys, set_=changes), rows
+    )
+
+
+def _hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def record_order_placed(placed_at, lines):
+    """
+    Add a newly placed order to the rollups.
+    lines maps item IDs to (quantity, unit price). The caller commits.
+    """
+    revenue = sum(price * qty for qty, price in lines.values())
+    _upsert(
+        ItemSalesDaily,
+        ["day", "item_id"],
+        [
+            {
+                "day": placed_at.date(),
+                "item_id": item_id,
+                "quantity": qty,
+                "revenue": price * qty,
+                "cancelled_quantity": 0,
+                "refunded": Decimal("0"),
+            }
+            for item_id, (qty, price) in lines.items()
+        ],
+        add=("quantity", "revenue"),
+    )
+    _upsert(
+        OrderHourly,
+        ["hour"],
+        [{"hour": _hour(placed_at), "orders": 1, "revenue": revenue, "cancelled": 0}],
+        add=("orders", "revenue"),
+    )
+
+
+def record_order_cancelled(order):
+    """
+    Count an order's lines as cancelled and refunded, against the day and
+    hour it was placed. The caller commits.
+    """
+    record_cancellations(
+        [
+            (order.timestamp, line.item_id, line.quantity, line.unit_price)
+            for line in order.lines
+        ],
+        [order.timestamp],
+    )
+
+
+def record_cancellations(lines, placed_times):
+    """
+    Count many cancelled orders at once, with one statement per rollup table.
+    lines holds (placed at, item ID, quantity, unit price) for every line of
+    the orders, and placed_times when each order was placed. The caller commits.
+    """
+    items = {}
+    for placed_at, item_id, qty, price in lines:
+        key = (placed_at.date(), item_id)
+        quantity, refunded = items.get(key, (0, Decimal("0")))
+        items[key] = (quantity + qty, refunded + price * qty)
+    hours = {}
+    for placed_at in placed_times:
+        hours[_hour(placed_at)] = hours.get(_hour(placed_at), 0) + 1
+
+    if items:
+        _upsert(
+            ItemSalesDaily,
+            ["day", "item_id"],
+            [
+                {
+                    "day": day,
+                    "item_id": item_id,
+                    "quantity": 0,
+                    "revenue": Decimal("0"),
+                    "cancelled_quantity": quantity,
+                    "refunded": refunded,
+                }
+                for (day, item_id), (quantity, refunded) in items.items()
+            ],
+            add=("cancelled_quantity", "refunded"),
+        )
+    if hours:
+        _upsert(
+            OrderHourly,
+            ["hour"],
+            [
+                {"hour": hour, "orders": 0, "revenue": Decimal("0"), "cancelled": count}
+                for hour, count in hours.items()
+            ],
+            add=("cancelled",),
+        )
+
+
+def record_transitions(old_status, new_status, started_times, changed_at):
+    """
+    Count several orders making the same status change at changed_at, as one
+    upsert. started_times holds when each reached old_status (None if unknown).
+    Changes from a status with no recorded start (older orders) are left out,
+    so the averages stay honest. The caller commits.
+    """
+    seconds = [
+        max(0.0, (changed_at - started_at).total_seconds())
+        for started_at in started_times
+        if started_at is not None
+    ]
+    if not seconds:
+        return
+    _upsert(
+        StatusTransitionDaily,
+        ["day", "from_status", "to_status"],
+        [
+            {
+                "day": changed_at.date(),
+                "from_status": old_status,
+                "to_status": new_status,
+                "count": len(seconds),
+                "total_seconds": sum(seconds),
+                "max_seconds": max(seconds),
+            }
+        ],
+        add=("count", "total_seconds"),
+        greatest=("max_seconds",),
+    )
+
+
+def _seconds_between(start, end):
+    return (func.julianday(end) - func.julianday(start)) * 86400.0
+
+
+def _transition_select(from_status, to_status, start, end, *conditions):
+    """Group orders' start/end times for one transition into rollup rows."""
+    seconds = _seconds_between(start, end)
+    return (
+        select(
+            func.date(end),
+            from_status,
+            literal(to_status),
+            func.count(),
+            func.sum(seconds),
+            func.max(seconds),
+        )
+        .where(start.isnot(None), end.isnot(None), *conditions)
+        .group_by(func.date(end), from_status)
+    )
+
+
+def rebuild_rollups():
+    """
+    Recompute every rollup from the order tables, with a handful of
+    INSERT ... SELECT statements. The caller commits.
+    """
+    for model in (ItemSalesDaily, OrderHourly, StatusTransitionDaily):
+        db.session.execute(delete(model))
+
+    cancelled = Order.status == OrderStatus.CANCELLED.value
+    line_total = OrderLine.quantity * OrderLine.unit_price
+    db.session.execute(
+        insert(ItemSalesDaily).from_select(
+            [
+                "day",
+                "item_id",
+                "quantity",
+                "revenue",
+                "cancelled_quantity",
+                "refunded",
+            ],
+            select(
+                func.date(Order.timestamp),
+                OrderLine.item_id,
+                func.sum(OrderLine.quantity),
+                func.sum(line_total),
+                func.sum(case((cancelled, OrderLine.quantity), else_=0)),
+                func.sum(case((cancelled, line_total), else_=0)),
+            )
+            .join(Order, OrderLine.order_id == Order.id)
+            .group_by(func.date(Order.timestamp), OrderLine.item_id),
+        )
+    )
+
+    # Same text format SQLAlchemy stores DateTime values in on SQLite
+    hour = func.strftime("%Y-%m-%d %H:00:00.000000", Order.timestamp)
+    db.session.execute(
+        insert(OrderHourly).from_select(
+            ["hour", "orders", "revenue", "cancelled"],
+            select(
+                hour,
+                func.count(),
+                func.sum(Order.total_cost),
+                func.sum(case((cancelled, 1), else_=0)),
+            ).group_by(hour),
+        )
+    )
+
+    flow = [
+        (OrderStatus.AWAITING, Order.timestamp),
+        (OrderStatus.CONFIRMED, Order.confirmed_at),
+        (OrderStatus.PREPARING, Order.preparing_at),
+        (OrderStatus.READY, Order.ready_at),
+        (OrderStatus.COMPLETED, Order.completed_at),
+    ]
+    selects = [
+        _transition_select(literal(old.value), new.value, start, end)
+        for (old, start), (new, end) in zip(flow, flow[1:])
+    ]
+    # A cancelled order was cancelled from the last status it reached
+    last_status = case(
+        *[(end.isnot(None), literal(status.value)) for status, end in flow[:0:-1]],
+        else_=literal(OrderStatus.AWAITING.value),
+    )
+    last_started = func.coalesce(*[end for _, end in flow[::-1]])
+    selects.append(
+        _transition_select(
+            last_status, OrderStatus.CANCELLED.value, last_started, Order.cancelled_at
+        )
+    )
+    for query in selects:
+        db.session.execute(
+            insert(StatusTransitionDaily).from_select(
+                [
+                    "day",
+                    "from_status",
+                    "to_status",
+                    "count",
+                    "total_seconds",
+                    "max_seconds",
+                ],
+                query,
+            )
+        )
+
+
+def _money(value):
+    return f"{value or 0:.2f}"
+
+
+def performance_report(days=30, today=None):
+    """
+    Figures for the performance dashboard over the last `days` days
+    (including today), read only from the rollup tables. Their size depends
+    on the number of days, items and statuses, not on the number of orders.
+    Returns plain values, so the result can be sent as JSON as it is.
+    """
+    today = today or datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    in_range = (OrderHourly.hour >= start, OrderHourly.hour < end)
+
+    orders, revenue, cancelled = db.session.execute(
+        select(
+            func.sum(OrderHourly.orders),
+            func.sum(OrderHourly.revenue),
+            func.sum(OrderHourly.cancelled),
+        ).where(*in_range)
+    ).one()
+
+    day = func.date(OrderHourly.hour)
+    daily = db.session.execute(
+        select(day, func.sum(OrderHourly.orders), func.sum(OrderHourly.revenue))
+        .where(*in_range)
+        .group_by(day)
+        .order_by(day)
+    ).all()
+
+    hour_of_day = func.strftime("%H", OrderHourly.hour)
+    hourly = db.session.execute(
+        select(hour_of_day, func.sum(OrderHourly.orders))
+        .where(*in_range)
+        .group_by(hour_of_day)
+        .order_by(hour_of_day)
+    ).all()
+
+    net_revenue = func.sum(ItemSalesDaily.revenue) - func.sum(ItemSalesDaily.refunded)
+    items = db.session.execute(
+        select(
+            ItemSalesDaily.item_id,
+            Item.name,
+            func.sum(ItemSalesDaily.quantity)
+            - func.sum(ItemSalesDaily.cancelled_quantity),
+            net_revenue,
+        )
+        .outerjoin(Item, Item.id == ItemSalesDaily.item_id)
+        .where(ItemSalesDaily.day >= first_day, ItemSalesDaily.day <= today)
+        .group_by(ItemSalesDaily.item_id, Item.name)
+        .order_by(net_revenue.desc())
+    ).all()
+
+    transitions = db.session.execute(
+        select(
+            StatusTransitionDaily.from_status,
+            StatusTransitionDaily.to_status,
+            func.sum(StatusTransitionDaily.count),
+            func.sum(StatusTransitionDaily.total_seconds),
+            func.max(StatusTransitionDaily.max_seconds),
+        )
+        .where(
+            StatusTransitionDaily.day >= first_day, StatusTransitionDaily.day <= today
+        )
+        .group_by(StatusTransitionDaily.from_status, StatusTransitionDaily.to_status)
+    ).all()
+    flow = [status.value for status in OrderStatus]
+    transitions.sort(key=lambda row: (flow.index(row[1]), flow.index(row[0])))
+
+    return {
+        "from": first_day.isoformat(),
+        "to": today.isoformat(),
+        "orders": orders or 0,
+        "revenue": _money(revenue),
+        "cancelled": cancelled or 0,
+        "daily": [
+            {"day": str(row_day), "orders": count, "revenue": _money(total)}
+            for row_day, count, total in daily
+        ],
+        "orders_by_hour": [
+            {"hour": int(row_hour), "orders": count} for row_hour, count in hourly
+        ],
+        "items": [
+            {
+                "item_id": item_id,
+                "name": name or f"Deleted item #{item_id}",
+                "quantity": quantity,
+                "revenue": _money(total),
+            }
+            for item_id, name, quantity, total in items
+        ],
+        "transitions": [
+            {
+                "from": from_status,
+                "to": to_status,
+                "count": count,
+                "average_seconds": round(total / count, 1),
+                "max_seconds": round(longest, 1),
+            }
+            for from_status, to_status, count, total, longest in transitions
+        ],
+    }
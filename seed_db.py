@@ -1,130 +1,311 @@
-from models import db, User, Item, Order, OrderStatus
+from flask import current_app
+
+from models import (
+    db,
+    User,
+    Item,
+    Order,
+    OrderLine,
+    OrderStatus,
+    STATUS_TIMESTAMPS,
+)
+from images import backfill_images
+from rollups import rebuild_rollups
+from passwords import hash_password
+from synthetic import SYNTHETIC_PASSWORD
+from sqlalchemy import bindparam, func, insert, update
+from datetime import datetime, timedelta
 from decimal import Decimal
 import os
+import random
 import shutil
 
-
-def create_user(email, password, is_staff=False):
-    """Create a user if one with the given email doesn't already exist."""
-    existing = User.query.filter_by(email=email).first()
-    if existing:
-        print(f"User '{email}' already exists.")
-        return existing
-
-    user = User(
-        email=email, is_staff=is_staff, credit=Decimal("100.00")
-    )  # Add starting credit
-    user.set_password(password)
-    db.session.add(user)
-    db.session.commit()
-    print(f"User '{email}' created.")
-    return user
-
-
-def create_item(name, price, quantity, is_vegetarian=False):
-    """Create an item if it doesn't already exist."""
-    existing = Item.query.filter_by(name=name).first()
-    if existing:
-        print(f"Item '{name}' already exists.")
-        return existing
-
-    item = Item(
-        name=name, price=Decimal(price), quantity=quantity, is_vegetarian=is_vegetarian
-    )
-    db.session.add(item)
-    db.session.commit()
-    print(f"Item '{name}' created.")
-    return item
-
-
-def create_order(user, item, quantity, status=OrderStatus.AWAITING):
-    """Create an order for a given user and item."""
-    if quantity > item.quantity:
-        print(f"Not enough stock to place order for {item.name}")
-        return None
-
-    total_cost = item.price * quantity
-    if user.credit < total_cost:
-        print(f"User '{user.email}' does not have enough credit.")
-        return None
-
-    # Deduct stock and credit
-    item.quantity -= quantity
-    user.credit -= total_cost
-
-    order = Order(
-        user_id=user.id,
-        item_id=item.id,
-        quantity=quantity,
-        total_cost=total_cost,
-        status=status.value,
+# Rows per executemany INSERT, and names per IN lookup (well under SQLite's
+# limit on bound parameters)
+SEED_BATCH_SIZE = 5000
+LOOKUP_BATCH_SIZE = 500
+STARTING_CREDIT = Decimal("100.00")
+# Statuses a seeded order passes through on the way to its final one
+SEED_FLOW = [
+    OrderStatus.CONFIRMED,
+    OrderStatus.PREPARING,
+    OrderStatus.READY,
+    OrderStatus.COMPLETED,
+]
+
+
+def _stages(placed_at, status):
+    """(status, when) for each status a seeded order reached, 4 minutes apart."""
+    if status == OrderStatus.AWAITING:
+        return []
+    stages = (
+        SEED_FLOW[: SEED_FLOW.index(status) + 1] if status in SEED_FLOW else [status]
     )
-
-    db.session.add(order)
-    db.session.commit()
-    print(
-        f"Order created: {user.email} ordered {quantity} x {item.name} ({status.value})"
-    )
-    return order
+    return [
+        (stage, placed_at + timedelta(minutes=4 * step))
+        for step, stage in enumerate(stages, start=1)
+    ]
+
+
+def _lookup(column, values, *columns):
+    """Rows of (column, *columns) whose column is in values, in batched IN queries."""
+    values = list(values)
+    rows = []
+    for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+        batch = values[start : start + LOOKUP_BATCH_SIZE]
+        rows += db.session.query(column, *columns).filter(column.in_(batch)).all()
+    return rows
+
+
+def _insert_batches(model, rows):
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        db.session.execute(insert(model), rows[start : start + SEED_BATCH_SIZE])
+
+
+def bulk_create_users(users, password_hash=None):
+    """
+    Create many users at once from (email, password, is_staff) tuples, leaving
+    out emails that already exist.
+    - Existing emails are found with one upfront lookup instead of a query
+      per user.
+    - Each distinct password is hashed once. Pass password_hash to give every
+      new user a precomputed hash instead (e.g. synthetic accounts).
+    - Users go in with batched executemany INSERTs and no commit in between;
+      the caller commits.
+    Returns the number of users created.
+    """
+    users = {email: (password, is_staff) for email, password, is_staff in users}
+    existing = {email for email, in _lookup(User.email, users)}
+    hashes = {}
+    rows = []
+    for email, (password, is_staff) in users.items():
+        if email in existing:
+            continue
+        if password_hash is None and password not in hashes:
+            hashes[password] = hash_password(password)
+        rows.append(
+            {
+                "email": email,
+                "password_hash": password_hash or hashes[password],
+                "is_staff": is_staff,
+                "credit": STARTING_CREDIT,
+            }
+        )
+    _insert_batches(User, rows)
+    print(f"{len(rows)} user(s) created, {len(existing)} already existed.")
+    return len(rows)
+
+
+def bulk_create_items(items):
+    """
+    Create many items at once from (name, price, quantity, is_vegetarian,
+    image filename) tuples, leaving out names that already exist. Like
+    bulk_create_users(), with one upfront lookup and batched INSERTs; the
+    caller commits. Returns the number of items created.
+    """
+    items = {item[0]: item for item in items}
+    existing = {name for name, in _lookup(Item.name, items)}
+    rows = [
+        {
+            "name": name,
+            "price": Decimal(price),
+            "quantity": quantity,
+            "is_vegetarian": is_vegetarian,
+            "image_filename": image_filename,
+        }
+        for name, price, quantity, is_vegetarian, image_filename in items.values()
+        if name not in existing
+    ]
+    _insert_batches(Item, rows)
+    print(f"{len(rows)} item(s) created, {len(existing)} already existed.")
+    return len(rows)
+
+
+def bulk_create_orders(orders):
+    """
+    Create many single-item orders at once from (email, item name, quantity,
+    status, placed at) tuples; placed at may be None for 30 minutes ago.
+    - The users and items involved are loaded with one upfront lookup each.
+      Stock and credit are checked and taken in memory, in order, with the
+      same rules as placing an order; orders that fail them are skipped.
+    - Orders and lines go in with batched INSERTs, and the new stock and
+      credit with one executemany UPDATE each. The caller commits.
+    Rollups aren't updated; rebuild them afterwards (seed_all does). The
+    order counter and kitchen queue pick the orders up at their next
+    reconcile and rebuild.
+    Returns the number of orders created.
+    """
+    orders = list(orders)
+    users = {
+        email: [user_id, credit]
+        for email, user_id, credit in _lookup(
+            User.email, {order[0] for order in orders}, User.id, User.credit
+        )
+    }
+    items = {
+        name: [item_id, price, quantity]
+        for name, item_id, price, quantity in _lookup(
+            Item.name,
+            {order[1] for order in orders},
+            Item.id,
+            Item.price,
+            Item.quantity,
+        )
+    }
+
+    now = datetime.utcnow()
+    order_id = db.session.query(func.max(Order.id)).scalar() or 0
+    order_rows = []
+    line_rows = []
+    skipped = 0
+    for email, name, quantity, status, placed_at in orders:
+        user, item = users.get(email), items.get(name)
+        if user is None or item is None or quantity > item[2]:
+            skipped += 1
+            continue
+        total_cost = item[1] * quantity
+        if user[1] < total_cost:
+            skipped += 1
+            continue
+        item[2] -= quantity
+        user[1] -= total_cost
+
+        order_id += 1
+        placed_at = placed_at or now - timedelta(minutes=30)
+        row = dict.fromkeys(STATUS_TIMESTAMPS.values())
+        for stage, when in _stages(placed_at, status):
+            row[STATUS_TIMESTAMPS[stage.value]] = when
+        row.update(
+            id=order_id,
+            user_id=user[0],
+            total_cost=total_cost,
+            timestamp=placed_at,
+            status=status.value,
+        )
+        order_rows.append(row)
+        line_rows.append(
+            {
+                "order_id": order_id,
+                "item_id": item[0],
+                "quantity": quantity,
+                "unit_price": item[1],
+            }
+        )
+
+    _insert_batches(Order, order_rows)
+    _insert_batches(OrderLine, line_rows)
+    if order_rows:
+        users_table, items_table = User.__table__, Item.__table__
+        db.session.execute(
+            update(users_table)
+            .where(users_table.c.id == bindparam("user_id"))
+            .values(credit=bindparam("credit")),
+            [
+                {"user_id": user_id, "credit": credit}
+                for user_id, credit in users.values()
+            ],
+        )
+        db.session.execute(
+            update(items_table)
+            .where(items_table.c.id == bindparam("item_id"))
+            .values(quantity=bindparam("quantity")),
+            [
+                {"item_id": item_id, "quantity": quantity}
+                for item_id, _, quantity in items.values()
+            ],
+        )
+    print(f"{len(order_rows)} order(s) created, {skipped} skipped.")
+    return len(order_rows)
 
 
 def seed_default_users():
-    staff1 = create_user("homer@school.com", "homer123", is_staff=True)
-    staff2 = create_user("marge@school.com", "marge123", is_staff=True)
-
-    student1 = create_user("lisa@school.com", "lisa123", is_staff=False)
-    student2 = create_user("bart@school.com", "bart123", is_staff=False)
-    student3 = create_user("maggie@school.com", "maggie123", is_staff=False)
-
-    return [staff1, staff2], [student1, student2, student3]
+    return bulk_create_users(
+        [
+            ("homer@school.com", "homer123", True),
+            ("marge@school.com", "marge123", True),
+            ("lisa@school.com", "lisa123", False),
+            ("bart@school.com", "bart123", False),
+            ("maggie@school.com", "maggie123", False),
+        ]
+    )
 
 
 def seed_items():
-    item1 = create_item("Veggie Sandwich", "4.50", 10, is_vegetarian=True)
-    item1.image_filename = "veggie_sandwich.png"
-
-    item2 = create_item("Chicken Wrap", "5.00", 8)
-    item2.image_filename = "chicken_wrap.png"
-
-    item3 = create_item("Fruit Cup", "2.00", 15, is_vegetarian=True)
-    item3.image_filename = "fruit_cup.png"
-
-    item4 = create_item("Can of Conk", "1.75", 12, is_vegetarian=True)
-    item4.image_filename = "conk_can.png"
-
-    item5 = create_item("Can of Bepis", "1.75", 10, is_vegetarian=True)
-    item5.image_filename = "bepis_can.png"
-
-    item6 = create_item("Hot Chips", "3.50", 5, is_vegetarian=True)
-    item6.image_filename = "hot_chips.png"
-
-    db.session.commit()
-    return [item1, item2, item3, item4, item5, item6]
-
-
-def seed_orders(students, items):
-    lisa, bart, maggie = students
-
-    create_order(lisa, items[0], 1, status=OrderStatus.COMPLETED)
-    create_order(lisa, items[2], 2, status=OrderStatus.CONFIRMED)
-    create_order(lisa, items[1], 1, status=OrderStatus.READY)
+    return bulk_create_items(
+        [
+            ("Veggie Sandwich", "4.50", 10, True, "veggie_sandwich.png"),
+            ("Chicken Wrap", "5.00", 8, False, "chicken_wrap.png"),
+            ("Fruit Cup", "2.00", 15, True, "fruit_cup.png"),
+            ("Can of Conk", "1.75", 12, True, "conk_can.png"),
+            ("Can of Bepis", "1.75", 10, True, "bepis_can.png"),
+            ("Hot Chips", "3.50", 5, True, "hot_chips.png"),
+        ]
+    )
 
-    create_order(bart, items[3], 2, status=OrderStatus.CANCELLED)
-    create_order(bart, items[5], 1, status=OrderStatus.AWAITING)
 
-    create_order(maggie, items[4], 3, status=OrderStatus.PREPARING)
-    create_order(maggie, items[0], 1, status=OrderStatus.READY)
+def seed_orders():
+    return bulk_create_orders(
+        [
+            ("lisa@school.com", "Veggie Sandwich", 1, OrderStatus.COMPLETED, None),
+            ("lisa@school.com", "Fruit Cup", 2, OrderStatus.CONFIRMED, None),
+            ("lisa@school.com", "Chicken Wrap", 1, OrderStatus.READY, None),
+            ("bart@school.com", "Can of Conk", 2, OrderStatus.CANCELLED, None),
+            ("bart@school.com", "Hot Chips", 1, OrderStatus.AWAITING, None),
+            ("maggie@school.com", "Can of Bepis", 3, OrderStatus.PREPARING, None),
+            ("maggie@school.com", "Veggie Sandwich", 1, OrderStatus.READY, None),
+        ]
+    )
 
 
-def seed_all():
-    staff, students = seed_default_users()
-    items = seed_items()
-    seed_orders(students, items)
+def seed_volume(students, items, orders, days=30, seed=1):
+    """
+    Add extra students (student{n}@school.com, password SYNTHETIC_PASSWORD),
+    stocked items and completed or cancelled orders spread over the last
+    `days` days, for testing at a realistic size. One password hash is
+    shared by every extra student.
+    """
+    rng = random.Random(seed)
+    bulk_create_users(
+        [(f"student{n}@school.com", None, False) for n in range(1, students + 1)],
+        password_hash=hash_password(SYNTHETIC_PASSWORD) if students else None,
+    )
+    names = [f"Seeded Item {n}" for n in range(1, items + 1)]
+    bulk_create_items(
+        [
+            (name, f"{rng.randrange(100, 900, 25) / 100:.2f}", 100000, False, None)
+            for name in names
+        ]
+    )
 
-    # Copy images if missing
-    base_dir = os.path.dirname(__file__)
-    src_dir = os.path.join(base_dir, "static", "examples")
-    dest_dir = os.path.join(base_dir, "static", "uploads")
+    emails = [f"student{n}@school.com" for n in range(1, students + 1)]
+    now = datetime.utcnow()
+    if emails and names:
+        bulk_create_orders(
+            (
+                rng.choice(emails),
+                rng.choice(names),
+                1,
+                OrderStatus.CANCELLED if rng.random() < 0.05 else OrderStatus.COMPLETED,
+                now - timedelta(minutes=rng.uniform(60, days * 24 * 60)),
+            )
+            for _ in range(orders)
+        )
+
+
+def seed_all(students=0, items=0, orders=0):
+    """
+    Seed the default users, items and orders, plus `students`, `items` and
+    `orders` extra ones (see seed_volume()), in a single transaction.
+    """
+    seed_default_users()
+    seed_items()
+    seed_orders()
+    if students or items or orders:
+        seed_volume(students, items, orders)
+
+    # Copy images if missing, into the same folder the app serves uploads from
+    src_dir = os.path.join(os.path.dirname(__file__), "static", "examples")
+    dest_dir = current_app.config["UPLOAD_FOLDER"]
     os.makedirs(dest_dir, exist_ok=True)
 
     for filename in [
@@ -144,3 +325,9 @@ def seed_all():
                 print(f"Copied {filename} to uploads.")
             except FileNotFoundError:
                 print(f"WARNING: {filename} not found in examples folder.")
+
+    # Rename the copied item images by content hash and build their variants.
+    # The plain copies are left in place, so seeding again doesn't re-copy them.
+    backfill_images()
+    rebuild_rollups()
+    db.session.commit()
@@ -0,0 +1,252 @@
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Order, OrderLine, OrderStatus, PickupSlot
+
+# How a slot is shown to students and staff, e.g. "Tue 12:45"
+PICKUP_FORMAT = "%a %H:%M"
+
+# Days whose slots this process has already made sure exist
+_created_days = set()
+
+
+def school_time(when):
+    """
+    A stored (naive UTC) time on the school's clock, SCHOOL_TIMEZONE.
+    Slot times are stored in UTC like every other timestamp, and only
+    converted where they are worked out from the timetable or shown.
+    """
+    school_zone = ZoneInfo(current_app.config["SCHOOL_TIMEZONE"])
+    return when.replace(tzinfo=timezone.utc).astimezone(school_zone)
+
+
+def _stored_time(day, at=time()):
+    """The naive UTC time of a wall-clock time on a school day."""
+    school_zone = ZoneInfo(current_app.config["SCHOOL_TIMEZONE"])
+    local = datetime.combine(day, at, tzinfo=school_zone)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def pickup_label(starts_at):
+    """How a slot starting at `starts_at` is shown, e.g. "Tue 12:45"."""
+    return school_time(starts_at).strftime(PICKUP_FORMAT)
+
+
+def school_today(now=None):
+    """Today's date at the school."""
+    return school_time(now or datetime.utcnow()).date()
+
+
+def forget_slots():
+    """
+    Make ensure_slots check the database again, e.g. after the tables have
+    been recreated.
+    """
+    _created_days.clear()
+
+
+def _school_days(now):
+    """The next PICKUP_SLOT_DAYS weekdays, starting today if it is one."""
+    days = []
+    day = school_today(now)
+    while len(days) < current_app.config["PICKUP_SLOT_DAYS"]:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def ensure_slots(now=None):
+    """
+    Create the slots of the bookable school days from PICKUP_SLOT_TIMES, if
+    they don't exist yet. Runs once per day per process, and commits its own
+    short transaction, since it is called from pages that otherwise only read.
+    Slots that already exist keep their capacity and bookings.
+    """
+    days = [
+        day
+        for day in _school_days(now or datetime.utcnow())
+        if day not in _created_days
+    ]
+    if not days or not current_app.config["PICKUP_SLOT_TIMES"]:
+        return
+
+    config = current_app.config
+    length = timedelta(minutes=config["PICKUP_SLOT_MINUTES"])
+    rows = []
+    for day in days:
+        for start in config["PICKUP_SLOT_TIMES"]:
+            starts_at = _stored_time(day, start)
+            rows.append(
+                {
+                    "starts_at": starts_at,
+                    "ends_at": starts_at + length,
+                    "max_orders": config["PICKUP_SLOT_MAX_ORDERS"],
+                    "max_units": config["PICKUP_SLOT_MAX_UNITS"],
+                    "booked_orders": 0,
+                    "booked_units": 0,
+                }
+            )
+    # Another process may be creating the same slots at the same moment
+    db.session.execute(
+        insert(PickupSlot).on_conflict_do_nothing(index_elements=["starts_at"]),
+        rows,
+    )
+    db.session.commit()
+    _created_days.update(days)
+
+
+def booking_cutoff(now=None):
+    """Slots starting before this can no longer be booked."""
+    minutes = current_app.config["PICKUP_SLOT_CUTOFF_MINUTES"]
+    return (now or datetime.utcnow()) + timedelta(minutes=minutes)
+
+
+def bookable_slots(now=None):
+    """
+    The slots of the bookable school days that can still be booked,
+    earliest first, full ones included. One range seek on the starts_at
+    index; the remaining capacity comes straight from each slot's counters.
+    A bookable day with no slots at all (the tables were recreated since
+    ensure_slots last ran) gets them created again.
+    """
+    now = now or datetime.utcnow()
+    days = _school_days(now)
+    ensure_slots(now)
+    slots = _slots_between(days[0], days[-1] + timedelta(days=1))
+    missing = set(days) - {school_time(slot.starts_at).date() for slot in slots}
+    if missing:
+        _created_days.difference_update(missing)
+        ensure_slots(now)
+        slots = _slots_between(days[0], days[-1] + timedelta(days=1))
+    cutoff = booking_cutoff(now)
+    return [slot for slot in slots if slot.starts_at >= cutoff]
+
+
+def _slots_between(first_day, end_day):
+    """The slots from the start of first_day up to end_day, earliest first."""
+    return (
+        PickupSlot.query.filter(
+            PickupSlot.starts_at >= _stored_time(first_day),
+            PickupSlot.starts_at < _stored_time(end_day),
+        )
+        .order_by(PickupSlot.starts_at)
+        .all()
+    )
+
+
+def slot_choices(slots):
+    """Choices for a pickup slot field: as soon as possible, then each slot."""
+    choices = [(0, "As soon as possible")]
+    for slot in slots:
+        when = pickup_label(slot.starts_at)
+        if slot.remaining_orders and slot.remaining_units:
+            choices.append((slot.id, f"{when} ({slot.remaining_orders} left)"))
+        else:
+            choices.append((slot.id, f"{when} (full)"))
+    return choices
+
+
+def slot_availability(slot):
+    """
+    Describe a slot and its remaining capacity for the availability API.
+    Times are on the school's clock, with their UTC offset.
+    """
+    return {
+        "id": slot.id,
+        "starts_at": school_time(slot.starts_at).isoformat(),
+        "ends_at": school_time(slot.ends_at).isoformat(),
+        "max_orders": slot.max_orders,
+        "max_units": slot.max_units,
+        "remaining_orders": slot.remaining_orders,
+        "remaining_units": slot.remaining_units,
+        "available": bool(slot.remaining_orders and slot.remaining_units),
+    }
+
+
+def book_slot(slot_id, units, now=None):
+    """
+    Take one order and `units` item units from a slot's capacity.
+    - A guarded UPDATE (booked + n <= max, and not past the cutoff), so
+      concurrent orders can never overbook a slot.
+    - Runs in the caller's transaction, next to the stock and credit guards.
+    Returns the slot's start time, or None if it is full or closed.
+    """
+    return db.session.execute(
+        update(PickupSlot)
+        .where(
+            PickupSlot.id == slot_id,
+            PickupSlot.starts_at >= booking_cutoff(now),
+            PickupSlot.booked_orders + 1 <= PickupSlot.max_orders,
+            PickupSlot.booked_units + units <= PickupSlot.max_units,
+        )
+        .values(
+            booked_orders=PickupSlot.booked_orders + 1,
+            booked_units=PickupSlot.booked_units + units,
+        )
+        .returning(PickupSlot.starts_at),
+        execution_options={"synchronize_session": False},
+    ).scalar()
+
+
+def release_slots(bookings):
+    """
+    Give cancelled orders' capacity back, for {slot ID: (orders, units)},
+    with one CASE UPDATE. The caller is responsible for committing.
+    """
+    if not bookings:
+        return
+    orders = {slot_id: count for slot_id, (count, _) in bookings.items()}
+    units = {slot_id: count for slot_id, (_, count) in bookings.items()}
+    db.session.execute(
+        update(PickupSlot)
+        .where(PickupSlot.id.in_(bookings))
+        .values(
+            booked_orders=PickupSlot.booked_orders - case(orders, value=PickupSlot.id),
+            booked_units=PickupSlot.booked_units - case(units, value=PickupSlot.id),
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def slot_load(day):
+    """
+    Each slot of a school day with how many of its orders are in each
+    status, for the staff slot load page: a list of (PickupSlot, {status:
+    orders}).
+    """
+    slots = _slots_between(day, day + timedelta(days=1))
+    statuses = {slot.id: {} for slot in slots}
+    if slots:
+        rows = db.session.execute(
+            select(Order.pickup_slot_id, Order.status, func.count())
+            .where(Order.pickup_slot_id.in_(statuses))
+            .group_by(Order.pickup_slot_id, Order.status)
+        )
+        for slot_id, status, count in rows:
+            statuses[slot_id][status] = count
+    return [(slot, statuses[slot.id]) for slot in slots]
+
+
+def recount_slots():
+    """
+    Recompute every slot's booked orders and units from the order tables,
+    counting every order that isn't cancelled. The caller commits.
+    """
+    booked = (Order.pickup_slot_id == PickupSlot.id) & (
+        Order.status != OrderStatus.CANCELLED.value
+    )
+    orders = select(func.count(Order.id)).where(booked).scalar_subquery()
+    units = (
+        select(func.coalesce(func.sum(OrderLine.quantity), 0))
+        .join(Order, OrderLine.order_id == Order.id)
+        .where(booked)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(PickupSlot).values(booked_orders=orders, booked_units=units)
+    )
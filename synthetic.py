@@ -0,0 +1,278 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+import random
+
+from sqlalchemy import func, insert
+
+from models import db, User, Item, Order, OrderLine, OrderStatus, STATUS_TIMESTAMPS
+from passwords import hash_password
+from rollups import rebuild_rollups
+
+# Every generated account uses this password, so load tests can log in
+SYNTHETIC_PASSWORD = "password123"
+INSERT_BATCH_SIZE = 20000
+
+FOODS = [
+    "Sandwich",
+    "Wrap",
+    "Roll",
+    "Pie",
+    "Sausage Roll",
+    "Burger",
+    "Pizza Slice",
+    "Salad",
+    "Noodle Cup",
+    "Sushi Roll",
+    "Muffin",
+    "Cookie",
+    "Fruit Cup",
+    "Yoghurt",
+    "Smoothie",
+    "Juice",
+    "Milk",
+    "Water",
+    "Toastie",
+    "Pasta Bowl",
+]
+STYLES = [
+    "Chicken",
+    "Ham",
+    "Veggie",
+    "Cheese",
+    "Tuna",
+    "Beef",
+    "Egg",
+    "Falafel",
+    "Pumpkin",
+    "Spinach",
+    "Apple",
+    "Banana",
+    "Berry",
+    "Chocolate",
+    "Mango",
+]
+VEGETARIAN_STYLES = {
+    "Veggie",
+    "Cheese",
+    "Egg",
+    "Falafel",
+    "Pumpkin",
+    "Spinach",
+    "Apple",
+    "Banana",
+    "Berry",
+    "Chocolate",
+    "Mango",
+}
+
+# When orders arrive on a school day: (start, end, share of orders). Most
+# land in the minutes around recess and lunch.
+ORDER_WINDOWS = [
+    (time(7, 30), time(8, 45), 0.15),
+    (time(10, 45), time(11, 15), 0.35),
+    (time(12, 45), time(13, 30), 0.45),
+    (time(13, 30), time(15, 0), 0.05),
+]
+WINDOW_WEIGHTS = list(accumulate(window[2] for window in ORDER_WINDOWS))
+# Of the orders placed before today, how many end up cancelled
+CANCELLED_SHARE = 0.04
+# Minutes an order spends in each status before moving on
+STAGE_MINUTES = {
+    OrderStatus.AWAITING: (0.5, 6),
+    OrderStatus.CONFIRMED: (0.5, 4),
+    OrderStatus.PREPARING: (2, 12),
+    OrderStatus.READY: (1, 25),
+}
+FLOW = [
+    OrderStatus.AWAITING,
+    OrderStatus.CONFIRMED,
+    OrderStatus.PREPARING,
+    OrderStatus.READY,
+    OrderStatus.COMPLETED,
+]
+
+
+def _insert_batches(table, rows):
+    """Insert an iterable of row dicts with executemany, in fixed-size batches."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_BATCH_SIZE:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+
+
+def _school_days(count, end):
+    """The last `count` weekdays up to and including `end`, oldest first."""
+    days = []
+    day = end
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+
+def _order_time(rng, day):
+    start, end, _ = rng.choices(ORDER_WINDOWS, cum_weights=WINDOW_WEIGHTS)[0]
+    start = datetime.combine(day, start)
+    seconds = (datetime.combine(day, end) - start).total_seconds()
+    return start + timedelta(seconds=rng.uniform(0, seconds))
+
+
+def _order_history(rng, placed_at, final_status):
+    """Timestamps for each status an order passed through to reach final_status."""
+    stamps = dict.fromkeys(
+        ["confirmed_at", "preparing_at", "ready_at", "completed_at", "cancelled_at"]
+    )
+    if final_status == OrderStatus.AWAITING:
+        return stamps
+
+    when = placed_at
+    for status, next_status in zip(FLOW, FLOW[1:]):
+        when += timedelta(minutes=rng.uniform(*STAGE_MINUTES[status]))
+        if final_status == OrderStatus.CANCELLED and rng.random() < 0.5:
+            stamps["cancelled_at"] = when
+            return stamps
+        stamps[STATUS_TIMESTAMPS[next_status.value]] = when
+        if next_status == final_status:
+            return stamps
+
+    # Only cancelled orders get this far: they were refunded after pickup
+    stamps["cancelled_at"] = when + timedelta(minutes=rng.uniform(5, 60))
+    return stamps
+
+
+def generate_dataset(
+    students=5000,
+    staff=10,
+    items=200,
+    orders=2_000_000,
+    days=50,
+    active_orders=200,
+    seed=1,
+    log=print,
+):
+    """
+    Add a synthetic school to the database: student{n}@school.com and
+    staff{n}@school.com accounts (password SYNTHETIC_PASSWORD), a menu of
+    generated items, and a term of order history over the last `days`
+    school days.
+    - Orders arrive in bursts around recess and lunch and hold 1-3 lines.
+    - `orders` are spread over the school days before today and are all
+      completed or cancelled. Another `active_orders` were placed in the last
+      hour and are still with the kitchen. Every order gets realistic times
+      for the statuses it passed through.
+    - Generated history doesn't move stock or credit.
+    - Everything is inserted with batched executemany statements and one
+      password hash. The same seed gives the same data. The caller commits.
+    """
+    rng = random.Random(seed)
+    password_hash = hash_password(SYNTHETIC_PASSWORD)
+
+    first_user = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+    accounts = [("staff", n) for n in range(1, staff + 1)]
+    accounts += [("student", n) for n in range(1, students + 1)]
+    _insert_batches(
+        User,
+        (
+            {
+                "id": first_user + index,
+                "email": f"{role}{n}@school.com",
+                "password_hash": password_hash,
+                "is_staff": role == "staff",
+                "credit": Decimal(rng.randrange(0, 10000)) / 100,
+            }
+            for index, (role, n) in enumerate(accounts)
+        ),
+    )
+    student_ids = range(first_user + staff, first_user + staff + students)
+    log(f"Added {staff} staff and {students} student(s).")
+
+    first_item = (db.session.query(func.max(Item.id)).scalar() or 0) + 1
+    menu = []
+    names = [f"{style} {food}" for food in FOODS for style in STYLES]
+    rng.shuffle(names)
+    for n in range(items):
+        name = names[n % len(names)]
+        if n >= len(names):
+            name += f" #{n // len(names) + 1}"
+        menu.append(
+            {
+                "id": first_item + n,
+                "name": name,
+                "price": Decimal(rng.randrange(100, 900, 25)) / 100,
+                "quantity": rng.randrange(50, 500),
+                "is_vegetarian": name.split()[0] in VEGETARIAN_STYLES,
+                "image_filename": None,
+            }
+        )
+    _insert_batches(Item, menu)
+    # Some items sell far more than others
+    popularity = list(accumulate(rng.paretovariate(1.2) for _ in menu))
+    log(f"Added {items} item(s).")
+
+    now = datetime.utcnow()
+    # A term of history before today, then the orders still in the kitchen,
+    # placed over the last hour
+    days_of_orders = [
+        (day, orders // days + (orders % days if index == 0 else 0))
+        for index, day in enumerate(_school_days(days, now.date() - timedelta(days=1)))
+    ]
+    days_of_orders.append((None, active_orders))
+    active = [status for status in FLOW if status != OrderStatus.COMPLETED]
+
+    first_order = (db.session.query(func.max(Order.id)).scalar() or 0) + 1
+    order_id = first_order
+    order_rows = []
+    line_rows = []
+    for day, count in days_of_orders:
+        for _ in range(count):
+            if day is None:
+                placed_at = now - timedelta(minutes=rng.uniform(0, 60))
+                status = rng.choice(active)
+            else:
+                placed_at = _order_time(rng, day)
+                if rng.random() < CANCELLED_SHARE:
+                    status = OrderStatus.CANCELLED
+                else:
+                    status = OrderStatus.COMPLETED
+
+            total = Decimal("0")
+            lines = rng.choices(
+                menu, cum_weights=popularity, k=rng.choice((1, 1, 2, 3))
+            )
+            for item in {item["id"]: item for item in lines}.values():
+                quantity = rng.choice((1, 1, 1, 2, 3))
+                total += item["price"] * quantity
+                line_rows.append(
+                    {
+                        "order_id": order_id,
+                        "item_id": item["id"],
+                        "quantity": quantity,
+                        "unit_price": item["price"],
+                    }
+                )
+            order_rows.append(
+                {
+                    "id": order_id,
+                    "user_id": rng.choice(student_ids),
+                    "total_cost": total,
+                    "timestamp": placed_at,
+                    "status": status.value,
+                    **_order_history(rng, placed_at, status),
+                }
+            )
+            order_id += 1
+
+        if len(order_rows) >= INSERT_BATCH_SIZE or day is None:
+            _insert_batches(Order, order_rows)
+            _insert_batches(OrderLine, line_rows)
+            order_rows, line_rows = [], []
+            log(f"Added orders up to {day or 'now'} ({order_id - first_order} so far).")
+
+    rebuild_rollups()
+    log("Rebuilt the performance rollups.")
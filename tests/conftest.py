@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+import pytest
+
+from flask import g
+
+from app import create_app
+from config import Config
+from models import db, User, Item
+from catalogue import catalogue
+from counters import order_counter
+from kitchen import kitchen
+from slots import forget_slots
+
+PASSWORD = "password123"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """
+    One app for the whole run, on a throwaway SQLite file (not :memory:, so
+    threads in the concurrency tests share it).
+    """
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + str(
+            tmp_path_factory.mktemp("db") / "test.db"
+        )
+        UPLOAD_FOLDER = str(tmp_path_factory.mktemp("uploads"))
+        WTF_CSRF_ENABLED = False
+        AUDIT_ASYNC = False  # No background writer between tests
+        CATALOGUE_CACHE_ENABLED = False
+        FRAGMENT_CACHE_ENABLED = False
+        PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"  # Fast logins
+
+    app = create_app(TestConfig)
+
+    # Requests made from a test thread reuse the test's app context, and
+    # with it Flask-Login's cached user, so every client would act as
+    # whoever made the first request
+    @app.teardown_request
+    def forget_user(exception):
+        g.pop("_login_user", None)
+
+    return app
+
+
+@pytest.fixture
+def database(app):
+    """An empty database, and the in-process counters and queues reset to it."""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        catalogue.invalidate()
+        order_counter.reconcile()
+        kitchen.rebuild()
+        forget_slots()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(database):
+    def make_user(email, credit="0.00", is_staff=False):
+        user = User(email=email, credit=Decimal(credit), is_staff=is_staff)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def make_item(database):
+    def make_item(name, price, quantity):
+        item = Item(name=name, price=Decimal(price), quantity=quantity)
+        db.session.add(item)
+        db.session.commit()
+        return item
+
+    return make_item
+
+
+@pytest.fixture
+def login(app):
+    """A test client logged in as the given email."""
+
+    def login(email):
+        client = app.test_client()
+        client.post("/login", data={"email": email, "password": PASSWORD})
+        return client
+
+    return login
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from models import db, User, Order
+from helpers import (
+    place_order,
+    cancel_order,
+    bulk_cancel_orders,
+    PlaceOrderResult,
+)
+from bulk import bulk_top_up
+
+
+def stored_credit(user_id):
+    """The credit exactly as SQLite holds it, without the ORM's rounding."""
+    return db.session.execute(
+        text("SELECT credit FROM user WHERE id = :id"), {"id": user_id}
+    ).scalar()
+
+
+def test_spending_credit_to_the_last_cent(make_user, make_item):
+    user = make_user("student@school.com", credit="0.30")
+    item = make_item("Gum", "0.10", 10)
+
+    for _ in range(3):
+        result, _ = place_order(user, [(item, 1)])
+        assert result == PlaceOrderResult.PLACED
+
+    assert stored_credit(user.id) == 0
+    result, _ = place_order(user, [(item, 1)])
+    assert result == PlaceOrderResult.INSUFFICIENT_CREDIT
+
+
+def test_refunds_add_up_to_exact_cents(make_user, make_item):
+    user = make_user("student@school.com", credit="0.70")
+    item = make_item("Gum", "0.10", 10)
+    orders = [place_order(user, [(item, 1)])[1].id for _ in range(7)]
+    assert stored_credit(user.id) == 0
+
+    cancel_order(db.session.get(Order, orders[0]))
+    db.session.commit()
+    assert stored_credit(user.id) == 0.1
+
+    bulk_cancel_orders(orders[1:])
+    db.session.commit()
+    assert stored_credit(user.id) == 0.7
+
+
+def test_top_ups_add_up_to_exact_cents(make_user, make_item):
+    user = make_user("student@school.com")
+    item = make_item("Gum", "0.30", 10)
+
+    for line in range(3):
+        bulk_top_up([(line, ["student@school.com", "0.10"])])
+        db.session.commit()
+
+    assert stored_credit(user.id) == 0.3
+    result, _ = place_order(db.session.get(User, user.id), [(item, 1)])
+    assert result == PlaceOrderResult.PLACED
+    assert db.session.get(User, user.id).credit == Decimal("0.00")
@@ -0,0 +1,34 @@
+import io
+import os
+
+from models import db, Item
+
+
+def test_import_removes_images_it_replaces(app, make_user, make_item, login):
+    make_user("staff@school.com", is_staff=True)
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    for name in ("old.png", "shared.png", "new.png"):
+        with open(os.path.join(upload_folder, name), "wb") as f:
+            f.write(b"image")
+    for name, image in (("Pie", "old.png"), ("Soup", "shared.png")):
+        make_item(name, "3.00", 5).image_filename = image
+    make_item("Salad", "4.00", 5).image_filename = "shared.png"
+    db.session.commit()
+
+    menu = (
+        "name,price,quantity,is_vegetarian,image\n"
+        "Pie,3.00,5,no,new.png\n"
+        "Soup,3.00,5,no,new.png\n"
+    )
+    response = login("staff@school.com").post(
+        "/items/import",
+        data={"menu_file": (io.BytesIO(menu.encode()), "menu.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+
+    assert not os.path.exists(os.path.join(upload_folder, "old.png"))
+    assert os.path.exists(os.path.join(upload_folder, "shared.png"))  # Salad
+    assert os.path.exists(os.path.join(upload_folder, "new.png"))
+    images = dict(db.session.query(Item.name, Item.image_filename))
+    assert images == {"Pie": "new.png", "Soup": "new.png", "Salad": "shared.png"}
@@ -0,0 +1,19 @@
+def test_metrics_need_staff_or_the_token(app, make_user, login):
+    make_user("student@school.com")
+    make_user("staff@school.com", is_staff=True)
+    client = app.test_client()
+    local = {"REMOTE_ADDR": "127.0.0.1"}  # What a same-host proxy looks like
+
+    assert client.get("/metrics", environ_base=local).status_code == 403
+    assert login("student@school.com").get("/metrics").status_code == 403
+    assert login("staff@school.com").get("/metrics").status_code == 200
+
+    app.config["METRICS_TOKEN"] = "scrape-secret"
+    try:
+        wrong = {"Authorization": "Bearer guess"}
+        right = {"Authorization": "Bearer scrape-secret"}
+        assert client.get("/metrics", headers=wrong).status_code == 403
+        assert client.get("/metrics", headers=right).status_code == 200
+    finally:
+        app.config["METRICS_TOKEN"] = ""
+    assert client.get("/metrics", headers=right).status_code == 403
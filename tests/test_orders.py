@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import time
+
+from sqlalchemy import update
+
+from models import db, User, Item, Order, OrderStatus, AuditEvent
+from helpers import (
+    place_order,
+    cancel_order,
+    change_order_status,
+)
+
+# Orders (placed or turned away) per second the oversell stress test must reach
+MIN_ORDERS_PER_SECOND = 50
+
+
+def test_cancelling_an_order_someone_else_changed_is_a_no_op(make_user, make_item):
+    user = make_user("student@school.com", credit="10.00")
+    item = make_item("Fruit Cup", "2.00", 5)
+    _, order = place_order(user, [(item, 1)])
+    stale = db.session.get(Order, order.id)
+    assert stale.status == OrderStatus.AWAITING.value
+
+    # Another staff member confirms it, on their own connection
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(Order)
+            .where(Order.id == order.id)
+            .values(status=OrderStatus.CONFIRMED.value)
+        )
+
+    assert cancel_order(stale) is False
+    assert change_order_status(stale, OrderStatus.CONFIRMED.value) is False
+    db.session.commit()
+    assert db.session.get(User, user.id).credit == Decimal("8.00")
+    assert db.session.get(Item, item.id).quantity == 4
+
+
+def test_concurrent_cancels_refund_once(app, make_user, make_item, login):
+    user = make_user("student@school.com", credit="10.00")
+    make_user("staff@school.com", is_staff=True)
+    item = make_item("Fruit Cup", "2.00", 5)
+    order_id = place_order(user, [(item, 2)])[1].id
+    user_id, item_id = user.id, item.id  # The requests below end this session
+    clients = [login("staff@school.com") for _ in range(8)]
+
+    def cancel(client):
+        return client.post(
+            "/orders", data={"order_id": order_id, "action": "cancel"}
+        ).status_code
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        assert set(pool.map(cancel, clients)) == {302}
+
+    assert db.session.get(User, user_id).credit == Decimal("10.00")
+    assert db.session.get(Item, item_id).quantity == 5
+    assert AuditEvent.query.filter_by(action="order.cancelled").count() == 1
+
+
+def test_concurrent_advances_take_each_step_once(app, make_user, make_item, login):
+    user = make_user("student@school.com", credit="10.00")
+    make_user("staff@school.com", is_staff=True)
+    item = make_item("Fruit Cup", "2.00", 5)
+    order_id = place_order(user, [(item, 1)])[1].id
+    user_id, item_id = user.id, item.id  # The requests below end this session
+    clients = [login("staff@school.com") for _ in range(8)]
+
+    def advance(client):
+        return client.post(
+            "/orders", data={"order_id": order_id, "action": "advance"}
+        ).status_code
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        assert set(pool.map(advance, clients)) == {302}
+
+    # Clicks that lost a race change nothing, so every step the order took
+    # was taken exactly once
+    steps = [
+        OrderStatus.AWAITING.value,
+        OrderStatus.CONFIRMED.value,
+        OrderStatus.PREPARING.value,
+        OrderStatus.READY.value,
+        OrderStatus.COMPLETED.value,
+    ]
+    status = db.session.get(Order, order_id).status
+    advanced = AuditEvent.query.filter_by(action="order.advanced").count()
+    assert advanced == steps.index(status) > 0
+
+
+def test_concurrent_orders_never_oversell(make_user, make_item, login):
+    """
+    300 students order the last 50 of an item at the same moment: exactly
+    50 orders go through, nobody is charged for the rest, and the guarded
+    updates keep up a usable rate.
+    """
+    emails = [f"student{n}@school.com" for n in range(300)]
+    for email in emails:
+        make_user(email, credit="10.00")
+    item_id = make_item("Hot Chips", "3.50", 50).id
+    clients = [login(email) for email in emails]
+
+    def order(client):
+        return client.post(f"/order/{item_id}", data={"quantity": 1}).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        list(pool.map(order, clients))
+    elapsed = time.perf_counter() - started
+
+    assert db.session.get(Item, item_id).quantity == 0
+    assert Order.query.count() == 50
+    assert User.query.filter(User.credit < 0).count() == 0
+    spent = sum(Decimal("10.00") - user.credit for user in User.query)
+    assert spent == 50 * Decimal("3.50")
+    # About 275 orders/s on a 1-CPU sandbox; the floor leaves room for slow CI
+    assert len(clients) / elapsed >= MIN_ORDERS_PER_SECOND
+
+
+def test_concurrent_orders_never_overdraw_credit(make_user, make_item, login):
+    """One student with credit for three orders places ten at once."""
+    user_id = make_user("student@school.com", credit="10.50").id
+    item_id = make_item("Hot Chips", "3.50", 100).id
+    clients = [login("student@school.com") for _ in range(10)]
+
+    def order(client):
+        return client.post(f"/order/{item_id}", data={"quantity": 1}).status_code
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        list(pool.map(order, clients))
+
+    assert db.session.get(User, user_id).credit == Decimal("0.00")
+    assert db.session.get(Item, item_id).quantity == 97
+    assert Order.query.count() == 3
@@ -0,0 +1,25 @@
+from werkzeug.security import generate_password_hash
+
+from passwords import hash_password, needs_rehash
+
+
+def test_shorthand_methods_do_not_rehash_every_login(app):
+    with app.app_context():
+        old_method = app.config["PASSWORD_HASH_METHOD"]
+        try:
+            app.config["PASSWORD_HASH_METHOD"] = "scrypt"
+            assert not needs_rehash(hash_password("secret"))
+            assert needs_rehash(generate_password_hash("secret", "scrypt:16384:8:1"))
+            assert needs_rehash(generate_password_hash("secret", old_method))
+        finally:
+            app.config["PASSWORD_HASH_METHOD"] = old_method
+        assert not needs_rehash(hash_password("secret"))
+
+
+def test_hash_pool_figures_are_exported(make_user, login):
+    make_user("staff@school.com", is_staff=True)
+    response = login("staff@school.com").get("/metrics")
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    for figure in ("workers", "in_flight", "queue_depth", "rejected"):
+        assert f'canteen_pool_{figure}{{pool="password_hash"}}' in body
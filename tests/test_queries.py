@@ -0,0 +1,72 @@
+from flask import g
+
+from models import db, User, Item, Order
+from helpers import place_order, bulk_advance_orders, cancel_order
+from counters import order_counter
+from queryplans import FULL_ORDER_SCAN, OLDER_PAGE, capture_plans, reads_orders
+
+
+def statement_count(client, path):
+    """SQL statements run by one request, from the request metrics."""
+    response = client.get(path)
+    assert response.status_code == 200
+    return g.metrics_statement_count
+
+
+def add_orders(user_id, item_ids, count):
+    """Place `count` two-line orders, confirming every other one."""
+    user = db.session.get(User, user_id)
+    items = [db.session.get(Item, item_id) for item_id in item_ids]
+    for n in range(count):
+        _, order = place_order(user, [(items[n % 3], 1), (items[(n + 1) % 3], 2)])
+        if n % 2:
+            bulk_advance_orders([order.id])
+            db.session.commit()
+
+
+def test_order_pages_run_the_same_queries_however_many_orders(
+    make_user, make_item, login
+):
+    student_id = make_user("student@school.com", credit="1000.00").id
+    make_user("staff@school.com", is_staff=True)
+    item_ids = [make_item(f"Item {n}", "1.00", 1000).id for n in range(3)]
+    staff_client = login("staff@school.com")
+    student_client = login("student@school.com")
+
+    counts = []
+    for more_orders in (3, 27):  # 3 orders, then 30
+        add_orders(student_id, item_ids, more_orders)
+        statement_count(staff_client, "/orders")  # Warm the in-process counters
+        counts.append(
+            (
+                statement_count(staff_client, "/orders"),
+                statement_count(student_client, "/my-orders"),
+            )
+        )
+
+    assert counts[0] == counts[1]
+
+
+def test_order_hot_paths_use_the_order_indexes(make_user, make_item, login):
+    student_id = make_user("student@school.com", credit="1000.00").id
+    make_user("staff@school.com", is_staff=True)
+    item_ids = [make_item(f"Item {n}", "1.00", 1000).id for n in range(3)]
+    add_orders(student_id, item_ids, 20)
+    for order in Order.query.limit(12).all():  # More than a page of closed orders
+        cancel_order(order)
+    db.session.commit()
+    staff_client = login("staff@school.com")
+    student_client = login("student@school.com")
+
+    with capture_plans(db.engine) as statements:
+        page = staff_client.get("/orders").get_data(as_text=True)
+        staff_client.get(OLDER_PAGE.search(page).group(1).replace("&amp;", "&"))
+        student_client.get("/my-orders")
+        order_counter.reconcile()
+
+    plans = ["\n".join(s.plan) for s in statements if reads_orders(s)]
+    assert not [plan for plan in plans if FULL_ORDER_SCAN.search(plan)]
+    assert any(
+        "ix_order_status_timestamp (status=? AND timestamp<?)" in p for p in plans
+    )
+    assert any("ix_order_user_timestamp (user_id=?)" in plan for plan in plans)
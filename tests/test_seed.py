@@ -0,0 +1,19 @@
+import os
+
+from commands import seed_database
+from models import Item
+
+
+def test_seed_images_go_to_the_configured_upload_folder(app, database):
+    repo_uploads = os.path.join(app.root_path, "static", "uploads")
+    before = set(os.listdir(repo_uploads)) if os.path.isdir(repo_uploads) else set()
+
+    seed_database(reset=True)
+
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    images = [item.image_filename for item in Item.query if item.image_filename]
+    assert images
+    for filename in images:
+        assert os.path.exists(os.path.join(upload_folder, filename))
+    after = set(os.listdir(repo_uploads)) if os.path.isdir(repo_uploads) else set()
+    assert after == before
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from models import db
+from slots import bookable_slots, pickup_label, slot_availability
+
+# Monday evening in UTC is already Tuesday morning in Sydney (UTC+11)
+MONDAY_EVENING_UTC = datetime(2026, 10, 19, 22, 0)
+
+
+def test_slots_follow_the_school_clock(app, database):
+    app.config["SCHOOL_TIMEZONE"] = "Australia/Sydney"
+    slots = bookable_slots(MONDAY_EVENING_UTC)
+
+    labels = [pickup_label(slot.starts_at) for slot in slots]
+    assert labels[:2] == ["Tue 10:45", "Tue 11:00"]
+    assert labels[-1] == "Wed 13:15"
+    assert len(labels) == 2 * len(app.config["PICKUP_SLOT_TIMES"])
+    assert slots[0].starts_at == datetime(2026, 10, 19, 23, 45)  # Stored in UTC
+    assert slot_availability(slots[0])["starts_at"] == "2026-10-20T10:45:00+11:00"
+
+
+def test_slots_come_back_after_the_tables_are_recreated(app, database):
+    app.config["SCHOOL_TIMEZONE"] = "Australia/Sydney"
+    assert bookable_slots(MONDAY_EVENING_UTC)
+
+    # As `flask seed --reset` does from another process
+    db.drop_all()
+    db.create_all()
+
+    assert len(bookable_slots(MONDAY_EVENING_UTC)) == 10
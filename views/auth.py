@@ -0,0 +1,142 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask_login import (
+    LoginManager,
+    login_user,
+    login_required,
+    logout_user,
+    current_user,
+)
+from models import db, User
+from forms import RegisterForm, LoginForm, EditAccountForm
+from counters import order_counter
+from passwords import HashPoolBusy
+
+# Set up Flask-Login; create_app() attaches it to the app
+login_manager = LoginManager()
+login_manager.login_view = "auth.login"  # Redirect to this route if login is required
+
+bp = Blueprint("auth", __name__)
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Load a user by ID for session tracking (used by Flask-Login)."""
+    return db.session.get(User, int(user_id))
+
+
+@bp.route("/")
+def home():
+    """Redirect users from the home page to the dashboard."""
+    return redirect(url_for("auth.dashboard"))
+
+
+@bp.route("/register", methods=["GET", "POST"])
+def register():
+    """
+    Register a new user.
+    - Redirects to dashboard if already logged in.
+    - Saves user to the database if form is valid.
+    """
+    if current_user.is_authenticated:
+        return redirect(
+            url_for("auth.dashboard")
+        )  # Don't allow already logged-in users to register again
+
+    form = RegisterForm()
+    # If the form was submitted (POST request) and passed all validation checks
+    if form.validate_on_submit():
+        # Create a new user and save to the database
+        user = User(email=form.email.data)
+        user.set_password(form.password.data)
+        db.session.add(user)
+        db.session.commit()
+        flash("Registration successful. Please log in.", "success")
+        return redirect(url_for("auth.login"))
+    return render_template("register.html", form=form)
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+    """
+    Log in an existing user.
+    - Redirects to dashboard if already logged in.
+    - Authenticates credentials and logs in the user.
+    """
+    if current_user.is_authenticated:
+        return redirect(url_for("auth.dashboard"))
+
+    form = LoginForm()
+    if form.validate_on_submit():
+        # Check if user exists and password is correct
+        user = User.query.filter_by(email=form.email.data).first()
+        # Hand the database connection back while waiting for a hash worker,
+        # so a login storm can't starve other pages of connections
+        db.session.close()
+        if user and user.check_password(form.password.data):
+            # Rehash with the current parameters if they've changed
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.add(user)
+                db.session.commit()
+            login_user(user)
+            return redirect(url_for("auth.dashboard"))
+        else:
+            flash("Invalid email or password", "danger")
+    return render_template("login.html", form=form)
+
+
+@bp.route("/logout")
+@login_required
+def logout():
+    """Log out the current user and redirect to the login page."""
+    logout_user()
+    return redirect(url_for("auth.login"))
+
+
+@bp.route("/dashboard")
+@login_required
+def dashboard():
+    """Render the dashboard page for logged-in users."""
+    return render_template("dashboard.html")
+
+
+@bp.route("/account", methods=["GET", "POST"])
+@login_required
+def account():
+    """
+    A form to change the logged in user's password.
+    Can be extended to other account management features in future.
+    """
+    form = EditAccountForm()
+
+    if form.validate_on_submit():
+        if not current_user.check_password(form.current_password.data):
+            flash("Current password is incorrect.", "danger")
+        else:
+            current_user.set_password(form.new_password.data)
+            db.session.commit()
+            flash("Your password has been updated.", "success")
+            return redirect(url_for("auth.account"))
+
+    return render_template("edit_account.html", form=form)
+
+
+@bp.app_errorhandler(HashPoolBusy)
+def hash_pool_busy(error):
+    """Handles a login storm that has filled the password hashing queue."""
+    flash("Lots of people are logging in right now. Please try again.", "warning")
+    return redirect(request.referrer or url_for("auth.login"))
+
+
+@bp.app_context_processor
+def inject_nav_data():
+    """
+    Used to pass credit amount (or active order quantity if staff)
+    into the navbar for display.
+    """
+    if current_user.is_authenticated:
+        if current_user.is_staff:
+            return {"active_order_count": order_counter.active_count()}
+        else:
+            return {"student_credit": current_user.credit}
+    return {}
@@ -0,0 +1,230 @@
+from flask import (
+    Blueprint,
+    render_template,
+    redirect,
+    url_for,
+    flash,
+    request,
+    send_from_directory,
+    stream_with_context,
+    Response,
+    current_app,
+)
+from flask_login import login_required, current_user
+from models import db, Item
+from forms import ItemForm, ItemImportForm
+from catalogue import catalogue
+from fragments import fragment_cache
+from images import save_image, remove_image
+import io
+
+bp = Blueprint("items", __name__)
+
+
+@bp.route("/items")
+@login_required
+def items():
+    """
+    Staff-only page for manging items in the store.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    all_items = Item.query.all()
+    return render_template(
+        "items.html",
+        items=all_items,
+        cache_stats=catalogue.stats(),
+        fragment_stats=fragment_cache.stats(),
+    )
+
+
+@bp.route("/items/add", methods=["GET", "POST"])
+@login_required
+def add_item():
+    """
+    Staff-only page for adding a new item to the store.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    form = ItemForm()
+    if form.validate_on_submit():
+        filename = None
+        if form.image.data:
+            try:
+                filename = save_image(form.image.data.read(), form.image.data.filename)
+            except ValueError as error:
+                flash(str(error), "danger")
+                return render_template("item_form.html", form=form, action="Add")
+
+        item = Item(
+            name=form.name.data,
+            price=form.price.data,
+            quantity=form.quantity.data,
+            is_vegetarian=form.is_vegetarian.data,
+            image_filename=filename,
+        )
+        db.session.add(item)
+        db.session.commit()
+        catalogue.invalidate()
+        fragment_cache.bump("item")
+        flash("Item added successfully.", "success")
+        return redirect(url_for("items.items"))
+    return render_template("item_form.html", form=form, action="Add")
+
+
+@bp.route("/items/import", methods=["GET", "POST"])
+@login_required
+def import_items_view():
+    """
+    Staff-only page for creating or updating many items at once from a CSV
+    or JSON menu file, matched on item name.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    from bulk import import_items, read_menu_records  # Rarely used; loaded on demand
+
+    form = ItemImportForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.menu_file.data
+        file_format = "json" if upload.filename.lower().endswith(".json") else "csv"
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig")
+        try:
+            report = import_items(
+                read_menu_records(stream, file_format),
+                current_app.config["UPLOAD_FOLDER"],
+            )
+        except (UnicodeDecodeError, ValueError) as error:
+            flash(f"Could not read the menu file: {error}", "danger")
+        else:
+            db.session.commit()
+            catalogue.invalidate()
+            fragment_cache.bump("item")
+            for filename in report.replaced_images:
+                remove_image(filename)  # Kept if another item shares it
+            flash(
+                f"Created {report.created} and updated {report.updated} item(s); "
+                f"{len(report.errors)} row(s) skipped.",
+                "warning" if report.errors else "success",
+            )
+    return render_template("items_import.html", form=form, report=report)
+
+
+@bp.route("/items/export")
+@login_required
+def export_items_view():
+    """
+    Staff-only download of every item as CSV (default) or JSON, in the
+    same format the import page accepts.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    from bulk import export_items
+
+    file_format = "json" if request.args.get("format") == "json" else "csv"
+    return Response(
+        stream_with_context(export_items(file_format)),
+        mimetype="application/json" if file_format == "json" else "text/csv",
+        headers={"Content-Disposition": f"attachment; filename=menu.{file_format}"},
+    )
+
+
+@bp.route("/items/<int:item_id>/edit", methods=["GET", "POST"])
+@login_required
+def edit_item(item_id):
+    """
+    Staff-only page for editing items in the store.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    item = Item.query.get_or_404(item_id)
+    form = ItemForm(obj=item)
+
+    if form.validate_on_submit():
+        # Store old filename BEFORE updating it
+        old_filename = item.image_filename
+
+        if form.image.data:
+            try:
+                item.image_filename = save_image(
+                    form.image.data.read(), form.image.data.filename
+                )
+            except ValueError as error:
+                flash(str(error), "danger")
+                return render_template("item_form.html", form=form, action="Edit")
+
+        # Update other fields
+        item.name = form.name.data
+        item.price = form.price.data
+        item.quantity = form.quantity.data
+        item.is_vegetarian = form.is_vegetarian.data
+
+        db.session.commit()
+        catalogue.invalidate()
+        fragment_cache.bump("item")
+        if old_filename != item.image_filename:
+            remove_image(old_filename)  # Kept if another item shares it
+        flash("Item updated successfully.", "success")
+        return redirect(url_for("items.items"))
+
+    return render_template("item_form.html", form=form, action="Edit")
+
+
+@bp.route("/media/<path:filename>")
+def media(filename):
+    """
+    Serve processed item images. Their names are content hashes, so a file
+    never changes and browsers can cache it for a year without revalidating.
+    """
+    response = send_from_directory(
+        current_app.config["UPLOAD_FOLDER"],
+        filename,
+        max_age=current_app.config["IMAGE_CACHE_MAX_AGE"],
+    )
+    response.cache_control.immutable = True
+    return response
+
+
+@bp.app_errorhandler(413)
+def file_too_large(error):
+    """Handles the situation when a staff member tries to upload an image greater than 2MB."""
+    flash("File is too large (max 2MB).", "danger")
+    return redirect(request.referrer or url_for("auth.dashboard"))
+
+
+@bp.route("/items/<int:item_id>/delete", methods=["POST"])
+@login_required
+def delete_item(item_id):
+    """
+    Staff-only action for deleting items.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    item = Item.query.get_or_404(item_id)
+    image_filename = item.image_filename
+
+    db.session.delete(item)
+    db.session.commit()
+    catalogue.invalidate()
+    fragment_cache.bump("item")
+    remove_image(image_filename)  # Kept if another item shares it
+    flash("Item deleted successfully.", "success")
+    return redirect(url_for("items.items"))
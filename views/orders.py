@@ -0,0 +1,294 @@
+from flask import (
+    Blueprint,
+    render_template,
+    redirect,
+    url_for,
+    flash,
+    request,
+    current_app,
+)
+from flask_login import login_required, current_user
+from models import db, Order, OrderLine, OrderStatus, ACTIVE_STATUSES, CLOSED_STATUSES
+from sqlalchemy.orm import joinedload, selectinload
+from helpers import (
+    get_next_status,
+    cancel_order,
+    change_order_status,
+    bulk_advance_orders,
+    bulk_cancel_orders,
+    keyset_paginate,
+)
+from catalogue import catalogue
+from fragments import fragment_cache
+from counters import order_counter
+from kitchen import kitchen
+from events import order_events, event_stream_response
+from audit import audit_log
+from slots import school_today, slot_load
+from datetime import datetime, timedelta
+
+bp = Blueprint("orders", __name__)
+
+
+def _event_waits(order_ids):
+    """{order ID: its kitchen queue position and minutes, or None} for events."""
+    waits = kitchen.estimates(order_ids)
+    return {
+        order_id: waits[order_id]._asdict() if order_id in waits else None
+        for order_id in order_ids
+    }
+
+
+def _load_uncached_rows(macro, rows):
+    """
+    Eager-load the student, pickup slot and line items of the orders whose
+    table row isn't in the fragment cache, in the same few queries however
+    many there are. Rows that are cached never touch them.
+    rows is a list of (fragment key, order), with the order ID first in the key.
+    """
+    missing = fragment_cache.missing(macro, [key for key, _ in rows])
+    if missing:
+        order_ids = [key[0] for key in missing]
+        Order.query.filter(Order.id.in_(order_ids)).options(
+            joinedload(Order.user),
+            joinedload(Order.pickup_slot),
+            selectinload(Order.lines).joinedload(OrderLine.item),
+        ).all()
+
+
+@bp.route("/orders", methods=["GET", "POST"])
+@login_required
+def manage_orders():
+    """
+    Staff-only page for viewing all orders.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    # Closed orders are paged with cursors rather than page numbers
+    cursor_args = {
+        key: request.args[key] for key in ("before", "after") if key in request.args
+    }
+
+    # Changes only redirect, so they are handled before the listings are loaded
+    if request.method == "POST":
+        order_id = int(request.form["order_id"])
+        action = request.form["action"]
+        order = Order.query.get_or_404(order_id)
+        old_status = order.status
+
+        # Both changes are guarded on the status loaded here, so an order
+        # someone else changed in the meantime (or a double submit) is left alone
+        changed = False
+        if action == "advance":
+            next_status = get_next_status(order.status)
+            if order.status != next_status:
+                changed = change_order_status(order, next_status)
+            if changed:
+                flash(f"Order #{order.id} advanced to '{next_status}'.", "success")
+        elif action == "cancel" and order.status != OrderStatus.CANCELLED.value:
+            changed = cancel_order(order)
+            if changed:
+                audit_log.record(
+                    "order.cancelled",
+                    "order",
+                    order.id,
+                    current_user,
+                    amount=order.total_cost,
+                    durable=True,
+                    from_status=old_status,
+                    refunded_user_id=order.user_id,
+                )
+                flash(
+                    f"Order #{order.id} cancelled. Credit refunded and stock restored.",
+                    "warning",
+                )
+        if not changed:
+            flash(f"Order #{order.id} was not changed.", "info")
+
+        new_status = order.status
+        user_id = order.user_id
+        db.session.commit()
+        if new_status != old_status:
+            if action == "advance":
+                audit_log.record(
+                    "order.advanced",
+                    "order",
+                    order_id,
+                    current_user,
+                    from_status=old_status,
+                    to_status=new_status,
+                )
+            order_counter.record(old_status, new_status)
+            kitchen.record(order_id, user_id, new_status)
+            order_events.publish(
+                "order-status",
+                id=order_id,
+                user_id=user_id,
+                status=new_status,
+                active_order_count=order_counter.active_count(),
+                wait=_event_waits([order_id])[order_id],
+            )
+        if changed and action == "cancel":
+            catalogue.invalidate()  # Returned stock may bring items back in stock
+        return redirect(url_for("orders.manage_orders", **cursor_args))
+
+    active_orders = (
+        Order.query.filter(Order.status.in_(ACTIVE_STATUSES))
+        .order_by(Order.timestamp.desc())
+        .all()
+    )
+
+    closed_orders_page = keyset_paginate(
+        Order.query.filter(Order.status.in_(CLOSED_STATUSES)),
+        per_page=current_app.config["CLOSED_ORDERS_PER_PAGE"],
+        **cursor_args,
+    )
+    # Rows are cached by what they show, including the kitchen's estimate
+    waits = kitchen.estimates([order.id for order in active_orders])
+    active_rows = [
+        ((order.id, order.status, waits.get(order.id)), order)
+        for order in active_orders
+    ]
+    closed_rows = [
+        ((order.id, order.status), order) for order in closed_orders_page.items
+    ]
+    # Rendered rows come from the fragment cache; only the rest need their
+    # student and line items
+    _load_uncached_rows("active_order_row", active_rows)
+    _load_uncached_rows("closed_order_row", closed_rows)
+
+    return render_template(
+        "manage_orders.html",
+        active_rows=active_rows,
+        waits=waits,
+        closed_rows=closed_rows,
+        closed_orders_page=closed_orders_page,
+        closed_statuses=CLOSED_STATUSES,
+    )
+
+
+@bp.route("/orders/bulk", methods=["POST"])
+@login_required
+def bulk_update_orders():
+    """
+    Staff-only action that advances or cancels every selected order on the
+    manage orders page at once, in a single transaction.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    order_ids = request.form.getlist("order_ids", type=int)
+    action = request.form.get("action")
+    if not order_ids or action not in ("advance", "cancel"):
+        flash("Select at least one order first.", "info")
+        return redirect(url_for("orders.manage_orders"))
+
+    if action == "advance":
+        changes = bulk_advance_orders(order_ids)
+    else:
+        changes = bulk_cancel_orders(order_ids)
+        audit_log.record_many(
+            [
+                audit_log.event(
+                    "order.cancelled",
+                    "order",
+                    change.order_id,
+                    current_user,
+                    amount=change.refund,
+                    from_status=change.old_status,
+                    refunded_user_id=change.user_id,
+                )
+                for change in changes
+            ],
+            durable=True,
+        )
+    db.session.commit()
+
+    if action == "advance":
+        audit_log.record_many(
+            [
+                audit_log.event(
+                    "order.advanced",
+                    "order",
+                    change.order_id,
+                    current_user,
+                    from_status=change.old_status,
+                    to_status=change.new_status,
+                )
+                for change in changes
+            ]
+        )
+    for change in changes:
+        order_counter.record(change.old_status, change.new_status)
+    kitchen.record_changes(changes)
+    active_order_count = order_counter.active_count()
+    waits = _event_waits([change.order_id for change in changes])
+    for change in changes:
+        order_events.publish(
+            "order-status",
+            id=change.order_id,
+            user_id=change.user_id,
+            status=change.new_status,
+            active_order_count=active_order_count,
+            wait=waits[change.order_id],
+        )
+
+    skipped = len(set(order_ids)) - len(changes)
+    note = f" {skipped} selected order(s) were skipped." if skipped else ""
+    if action == "advance":
+        flash(f"Advanced {len(changes)} order(s).{note}", "success")
+    else:
+        if changes:
+            catalogue.invalidate()  # Returned stock may bring items back in stock
+        refunded = sum(change.refund for change in changes)
+        flash(
+            f"Cancelled {len(changes)} order(s) and refunded ${refunded:.2f}.{note}",
+            "warning",
+        )
+    return redirect(url_for("orders.manage_orders"))
+
+
+@bp.route("/orders/slots")
+@login_required
+def pickup_slot_load():
+    """
+    Staff-only view of how full each pickup slot of a day is, and where its
+    orders are up to.
+    - ?day= picks the day, as YYYY-MM-DD (default today).
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    try:
+        day = datetime.strptime(request.args["day"], "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        day = school_today()
+
+    return render_template(
+        "pickup_slots.html",
+        day=day,
+        previous_day=day - timedelta(days=1),
+        next_day=day + timedelta(days=1),
+        slots=slot_load(day),
+        active_statuses=ACTIVE_STATUSES,
+    )
+
+
+@bp.route("/orders/stream")
+@login_required
+def order_stream():
+    """
+    Staff-only server-sent event stream of new orders and status changes,
+    used by the manage orders page to update itself without reloading.
+    """
+    if not current_user.is_staff:
+        return "Access denied.", 403
+
+    return event_stream_response(order_events.stream())
@@ -0,0 +1,110 @@
+from flask import (
+    Blueprint,
+    current_app,
+    render_template,
+    redirect,
+    url_for,
+    flash,
+    request,
+    Response,
+    jsonify,
+)
+from flask_login import login_required, current_user
+from models import User
+from rollups import performance_report
+from audit import audit_log, query_events
+from metrics import request_metrics
+from datetime import datetime, timedelta
+import hmac
+
+bp = Blueprint("reports", __name__)
+
+
+@bp.route("/performance")
+@login_required
+def performance():
+    """
+    Staff-only performance dashboard: sales per item, orders per hour and how
+    long orders take to move between statuses.
+    - Reads only the rollup tables (see rollups.py), never the order table.
+    - ?days= picks how many days back to cover (default 30).
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    days = min(max(request.args.get("days", 30, type=int), 1), 366)
+    return render_template(
+        "performance.html", report=performance_report(days), days=days
+    )
+
+
+@bp.route("/performance/data")
+@login_required
+def performance_data():
+    """The performance dashboard's figures as JSON, for the same ?days=."""
+    if not current_user.is_staff:
+        return "Access denied.", 403
+
+    days = min(max(request.args.get("days", 30, type=int), 1), 366)
+    return jsonify(performance_report(days))
+
+
+@bp.route("/metrics")
+def metrics():
+    """
+    Request latency, SQL and template figures per endpoint, in the Prometheus
+    text format.
+    - Open to staff, and to scrapers sending METRICS_TOKEN as a bearer token.
+    - The peer address is not trusted: behind a reverse proxy on the same
+      machine every request would look local.
+    """
+    token = current_app.config["METRICS_TOKEN"]
+    sent = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    scraper = bool(token) and hmac.compare_digest(sent.encode(), token.encode())
+    if not scraper and not (current_user.is_authenticated and current_user.is_staff):
+        return "Access denied.", 403
+
+    return Response(request_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/audit")
+@login_required
+def audit():
+    """
+    Staff-only view of the audit log, newest first.
+    - Filter by actor (?actor_id= or ?actor= email), subject (?subject_type=
+      and ?subject_id=) and date range (?since= and ?until=, as YYYY-MM-DD).
+    - Paged with a ?before= cursor, like the closed orders list.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    audit_log.flush()  # Show events still waiting for the background writer
+
+    actor_id = request.args.get("actor_id", type=int)
+    actor_email = request.args.get("actor", "").strip()
+    if actor_email:
+        actor = User.query.filter_by(email=actor_email).first()
+        actor_id = actor.id if actor else -1  # Unknown actors match nothing
+
+    def parse_day(name):
+        try:
+            return datetime.strptime(request.args.get(name, ""), "%Y-%m-%d")
+        except ValueError:
+            return None
+
+    until = parse_day("until")
+    events, older = query_events(
+        actor_id=actor_id,
+        subject_type=request.args.get("subject_type", "").strip() or None,
+        subject_id=request.args.get("subject_id", type=int),
+        since=parse_day("since"),
+        until=until + timedelta(days=1) if until else None,
+        before=request.args.get("before"),
+    )
+    filters = {
+        key: value for key, value in request.args.items() if key != "before" and value
+    }
+    return render_template("audit.html", events=events, older=older, filters=filters)
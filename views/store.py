@@ -0,0 +1,267 @@
+from flask import (
+    Blueprint,
+    render_template,
+    redirect,
+    url_for,
+    flash,
+    request,
+    session,
+    jsonify,
+)
+from flask_login import login_required, current_user
+from models import db, Item, Order, OrderLine, STATUS_TIMESTAMPS
+from forms import OrderForm, CheckoutForm
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from helpers import place_order, PlaceOrderResult
+from catalogue import catalogue
+from events import order_events, event_stream_response
+from conditional import page_etag, conditional_page
+from kitchen import kitchen
+from slots import bookable_slots, slot_choices, slot_availability
+
+bp = Blueprint("store", __name__)
+
+
+@bp.route("/store")
+@login_required
+def store():
+    """
+    Student-only page for browsing items in the store.
+    Redirects staff back to dashboard.
+    - Answers If-None-Match with 304 while the catalogue, credit and cart
+      are unchanged.
+    """
+    if current_user.is_staff:
+        flash("Store is for students only.", "info")
+        return redirect(url_for("auth.dashboard"))
+
+    # Read filter parameters from query string
+    name = request.args.get("name", "").strip()
+    min_price = request.args.get("min_price", type=float)
+    max_price = request.args.get("max_price", type=float)
+    min_quantity = request.args.get("min_quantity", type=int)
+    is_vegetarian = request.args.get("is_vegetarian") == "on"
+
+    def render():
+        # Filtering happens in memory over the cached catalogue of in-stock items
+        items = catalogue.search(
+            name=name,
+            min_price=min_price,
+            max_price=max_price,
+            min_quantity=min_quantity,
+            vegetarian_only=is_vegetarian,
+        )
+        return render_template("store.html", items=items)
+
+    # Without the catalogue cache there is no cheap version to go by
+    version = catalogue.version()
+    etag = page_etag(version) if version is not None else None
+    return conditional_page(etag, render)
+
+
+@bp.route("/order/<int:item_id>", methods=["GET", "POST"])
+@login_required
+def order_item(item_id):
+    """
+    Student-only page for ordering items in the store.
+    Redirects staff back to dashboard.
+    - Orders can be booked into a pickup slot, or collected as soon as
+      possible.
+    """
+    if current_user.is_staff:
+        flash("Only students can place orders.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    item = Item.query.get_or_404(item_id)
+
+    if item.quantity <= 0:
+        flash("This item is currently out of stock.", "warning")
+        return redirect(url_for("store.store"))
+
+    form = OrderForm()
+    form.pickup_slot.choices = slot_choices(bookable_slots())
+    if form.validate_on_submit():
+        qty = form.quantity.data
+
+        if form.add_to_cart.data:
+            cart = session.get("cart", {})
+            in_cart = cart.get(str(item.id), 0)
+            if in_cart + qty > item.quantity:
+                flash(f"Only {item.quantity} of '{item.name}' available.", "danger")
+            else:
+                cart[str(item.id)] = in_cart + qty
+                session["cart"] = cart
+                flash(f"Added {qty} x {item.name} to your cart.", "success")
+                return redirect(url_for("store.store"))
+        elif qty > item.quantity:
+            flash(f"Only {item.quantity} of '{item.name}' available.", "danger")
+        elif current_user.credit < item.price * qty:
+            flash("Insufficient credit to place this order.", "danger")
+        else:
+            # Stock, credit and slot capacity are re-checked inside the
+            # transaction, so another order placed since this page loaded can
+            # still win the race
+            result, order = place_order(
+                current_user, [(item, qty)], form.pickup_slot.data or None
+            )
+            if result == PlaceOrderResult.PLACED:
+                flash("Order placed successfully!", "success")
+                return redirect(url_for("store.store"))
+            elif result == PlaceOrderResult.OUT_OF_STOCK:
+                flash(
+                    f"Sorry, '{item.name}' sold out before your order went through.",
+                    "warning",
+                )
+                return redirect(url_for("store.store"))
+            elif result == PlaceOrderResult.SLOT_FULL:
+                flash(
+                    "Sorry, that pickup slot is full or closed. Please pick another.",
+                    "warning",
+                )
+                form.pickup_slot.choices = slot_choices(bookable_slots())
+            else:
+                flash("Insufficient credit to place this order.", "danger")
+
+    return render_template("order_item.html", item=item, form=form)
+
+
+@bp.route("/cart", methods=["GET", "POST"])
+@login_required
+def cart():
+    """
+    Student-only page for reviewing the cart and checking out.
+    The whole cart is placed as a single order in one transaction.
+    Redirects staff back to dashboard.
+    """
+    if current_user.is_staff:
+        flash("Only students can place orders.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    # The cart lives in the session as {item_id: quantity}
+    cart_quantities = session.get("cart", {})
+    cart_items = []
+    if cart_quantities:
+        cart_items = (
+            Item.query.filter(Item.id.in_([int(i) for i in cart_quantities]))
+            .order_by(Item.name)
+            .all()
+        )
+    lines = [(item, cart_quantities[str(item.id)]) for item in cart_items]
+    total_cost = sum(item.price * qty for item, qty in lines)
+
+    form = CheckoutForm()
+    form.pickup_slot.choices = slot_choices(bookable_slots())
+    if form.validate_on_submit() and lines:
+        short = [item.name for item, qty in lines if qty > item.quantity]
+        if short:
+            flash(f"Not enough stock for: {', '.join(short)}.", "danger")
+        elif current_user.credit < total_cost:
+            flash("Insufficient credit to place this order.", "danger")
+        else:
+            result, order = place_order(
+                current_user, lines, form.pickup_slot.data or None
+            )
+            if result == PlaceOrderResult.PLACED:
+                session.pop("cart", None)
+                flash("Order placed successfully!", "success")
+                return redirect(url_for("store.my_orders"))
+            elif result == PlaceOrderResult.OUT_OF_STOCK:
+                flash(
+                    "Sorry, an item in your cart sold out before your order went through.",
+                    "warning",
+                )
+            elif result == PlaceOrderResult.SLOT_FULL:
+                flash(
+                    "Sorry, that pickup slot is full or closed. Please pick another.",
+                    "warning",
+                )
+            else:
+                flash("Insufficient credit to place this order.", "danger")
+            return redirect(url_for("store.cart"))
+
+    return render_template("cart.html", lines=lines, total_cost=total_cost, form=form)
+
+
+@bp.route("/cart/<int:item_id>/remove", methods=["POST"])
+@login_required
+def remove_from_cart(item_id):
+    """Student-only action for removing an item from the cart."""
+    cart = session.get("cart", {})
+    if cart.pop(str(item_id), None) is not None:
+        session["cart"] = cart
+        flash("Item removed from your cart.", "info")
+    return redirect(url_for("store.cart"))
+
+
+@bp.route("/pickup-slots")
+@login_required
+def pickup_slots():
+    """
+    The pickup slots that can still be booked, with their remaining
+    capacity, as JSON.
+    - Remaining capacity comes from each slot's booked counters, so this
+      reads a handful of slot rows and never counts orders.
+    """
+    return jsonify([slot_availability(slot) for slot in bookable_slots()])
+
+
+@bp.route("/my-orders")
+@login_required
+def my_orders():
+    """
+    Student-only page for viewing their previous orders.
+    Redirects staff back to dashboard.
+    - Confirmed and Being Prepared orders show the kitchen's estimate of
+      when they will be ready.
+    - Answers If-None-Match with 304 while none of their orders have been
+      placed or changed status (and credit, cart, menu and estimates are
+      unchanged), after one aggregate query instead of loading every order.
+    """
+    if current_user.is_staff:
+        flash("Staff accounts do not place orders.", "info")
+        return redirect(url_for("auth.dashboard"))
+
+    def render():
+        orders = (
+            Order.query.filter_by(user_id=current_user.id)
+            .options(
+                selectinload(Order.lines).joinedload(OrderLine.item),
+                joinedload(Order.pickup_slot),
+            )
+            .order_by(Order.timestamp.desc())
+            .all()
+        )
+        return render_template("my_orders.html", orders=orders, waits=waits)
+
+    # Every status change stamps its own column, so the latest of these
+    # moves whenever an order does. The catalogue generation covers items
+    # being renamed.
+    orders_version = tuple(
+        db.session.query(
+            func.count(Order.id),
+            func.max(Order.timestamp),
+            *(
+                func.max(getattr(Order, column))
+                for column in STATUS_TIMESTAMPS.values()
+            ),
+        )
+        .filter(Order.user_id == current_user.id)
+        .one()
+    )
+    waits = kitchen.estimates_for_user(current_user.id)
+    etag = page_etag(orders_version, catalogue.generation, sorted(waits.items()))
+    return conditional_page(etag, render)
+
+
+@bp.route("/my-orders/stream")
+@login_required
+def my_order_stream():
+    """
+    Student-only server-sent event stream of changes to their own orders,
+    used by the my orders page to update statuses without reloading.
+    """
+    if current_user.is_staff:
+        return "Staff accounts do not place orders.", 403
+
+    return event_stream_response(order_events.stream(user_id=current_user.id))
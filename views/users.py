@@ -0,0 +1,157 @@
+from flask import Blueprint, render_template, redirect, url_for, flash
+from flask_login import login_required, current_user
+from models import db, User
+from forms import CreditForm, BulkCreditForm
+from audit import audit_log
+import io
+
+bp = Blueprint("users", __name__)
+
+
+@bp.route("/users")
+@login_required
+def users():
+    """
+    Staff-only view of all registered users.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    # Show a list of all users in the system
+    all_users = User.query.all()
+    return render_template("users.html", users=all_users)
+
+
+@bp.route("/credit", methods=["GET", "POST"])
+@login_required
+def credit():
+    """
+    Staff-only page that issues credit to students.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    form = CreditForm()
+    if form.validate_on_submit():
+        student = User.query.filter_by(email=form.email.data, is_staff=False).first()
+        if not student:
+            flash("Student not found or this person is not a student.", "danger")
+        else:
+            student.add_credit(form.amount.data)
+            audit_log.record(
+                "credit.added",
+                "user",
+                student.id,
+                current_user,
+                amount=form.amount.data,
+                durable=True,
+                email=student.email,
+            )
+            db.session.commit()
+            flash(
+                f"Added ${form.amount.data:.2f} to {student.email}'s account.",
+                "success",
+            )
+            return redirect(url_for("users.credit"))
+    return render_template("credit.html", form=form)
+
+
+@bp.route("/credit/bulk", methods=["GET", "POST"])
+@login_required
+def bulk_credit():
+    """
+    Staff-only page that tops up many students at once from a CSV of
+    email,amount rows, in a single transaction with a per-row error report.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    from bulk import bulk_top_up, read_csv_rows  # Rarely used; loaded on demand
+
+    form = BulkCreditForm()
+    report = None
+    if form.validate_on_submit():
+        stream = io.TextIOWrapper(form.csv_file.data.stream, encoding="utf-8-sig")
+        try:
+            report = bulk_top_up(
+                read_csv_rows(stream, header_first_cell="email"),
+                dry_run=form.dry_run.data,
+                actor=current_user,
+            )
+        except UnicodeDecodeError:
+            flash("The file must be a UTF-8 encoded CSV.", "danger")
+        else:
+            db.session.commit()
+            verb = "Would add" if form.dry_run.data else "Added"
+            flash(
+                f"{verb} ${report.total:.2f} to {report.students} student(s) "
+                f"from {report.rows} row(s); {len(report.errors)} row(s) skipped.",
+                "warning" if report.errors else "success",
+            )
+    return render_template("credit_bulk.html", form=form, report=report)
+
+
+@bp.route("/users/<int:user_id>/promote", methods=["POST"])
+@login_required
+def promote_user(user_id):
+    """
+    Staff-only action for promoting student accounts to staff accounts.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    user = User.query.get_or_404(user_id)
+
+    if user.is_staff:
+        flash("User is already a staff member.", "info")
+    else:
+        user.is_staff = True
+        db.session.commit()
+        audit_log.record(
+            "user.promoted", "user", user_id, current_user, email=user.email
+        )
+        flash(f"User '{user.email}' has been promoted to staff.", "success")
+
+    return redirect(url_for("users.users"))
+
+
+@bp.route("/users/<int:user_id>/delete", methods=["POST"])
+@login_required
+def delete_user(user_id):
+    """
+    Staff-only action for deleting users from the system.
+    Redirects non-staffs back to dashboard.
+    """
+    if not current_user.is_staff:
+        flash("Access denied.", "danger")
+        return redirect(url_for("auth.dashboard"))
+
+    user = User.query.get_or_404(user_id)
+
+    if user.id == current_user.id:
+        flash("You cannot delete your own account.", "danger")
+        return redirect(url_for("users.users"))
+
+    # Durable, since any credit left on the account goes with it
+    audit_log.record(
+        "user.deleted",
+        "user",
+        user.id,
+        current_user,
+        amount=user.credit,
+        durable=True,
+        email=user.email,
+        was_staff=user.is_staff,
+    )
+    db.session.delete(user)
+    db.session.commit()
+    flash(f"User '{user.email}' has been deleted.", "warning")
+    return redirect(url_for("users.users"))